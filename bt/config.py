@@ -29,4 +29,103 @@ class PyroConf(object):
     SESSION_STRING = getenv("SESSION_STRING")
     TELETHON_SESSION = getenv("TELETHON_SESSION")  # Add Telethon session support
     BOT_START_TIME = time()
-    COOKIES_FILE = "/home/user/kolo/bt/cookies.txt"  # Path for YouTube cookies
\ No newline at end of file
+    COOKIES_FILE = "/home/user/kolo/bt/cookies.txt"  # Path for YouTube cookies
+
+    # Adaptive transfer concurrency (AIMD), starts at INITIAL and moves between 1 and MAX
+    INITIAL_CONCURRENCY = int(getenv("INITIAL_CONCURRENCY", "2"))
+    MAX_CONCURRENT_DOWNLOADS = int(getenv("MAX_CONCURRENT_DOWNLOADS", "8"))
+    MAX_CONCURRENT_UPLOADS = int(getenv("MAX_CONCURRENT_UPLOADS", "8"))
+
+    # Disk admission: space kept free for the OS, and how much extra a split job needs
+    DISK_RESERVE_MB = int(getenv("DISK_RESERVE_MB", "1024"))
+    DISK_SPLIT_FACTOR = float(getenv("DISK_SPLIT_FACTOR", "2"))
+    # Assumed size for downloads whose size is not known up front (yt-dlp, no Content-Length)
+    DISK_UNKNOWN_SIZE_MB = int(getenv("DISK_UNKNOWN_SIZE_MB", "2048"))
+
+    # Photos/documents up to IN_MEMORY_MAX_KB are downloaded and uploaded from memory,
+    # as long as all in-memory jobs together stay below IN_MEMORY_CAP_MB
+    IN_MEMORY_MAX_KB = int(getenv("IN_MEMORY_MAX_KB", "1024"))
+    IN_MEMORY_CAP_MB = int(getenv("IN_MEMORY_CAP_MB", "64"))
+
+    # Fair-share job queue, split into a fast lane (text, photos, small files) and a
+    # heavy lane (anything above HEAVY_LANE_MIN_MB); optional "user_id:weight,..." shares
+    FAST_LANE_WORKERS = int(getenv("FAST_LANE_WORKERS", "4"))
+    HEAVY_LANE_WORKERS = int(getenv("HEAVY_LANE_WORKERS", "2"))
+    HEAVY_LANE_MIN_MB = int(getenv("HEAVY_LANE_MIN_MB", "200"))
+    USER_WEIGHTS = getenv("USER_WEIGHTS", "")
+
+    # Optional download cache (0 disables it); files are kept after upload up to this budget
+    CACHE_DIR = getenv("CACHE_DIR", "cache")
+    CACHE_MAX_MB = int(getenv("CACHE_MAX_MB", "0"))
+
+    # Fan-out: chats that also receive everything the bot delivers (ids or usernames,
+    # comma separated), and the minimum gap between sends to one private chat / group
+    FANOUT_CHATS = getenv("FANOUT_CHATS", "")
+    FANOUT_PRIVATE_INTERVAL = float(getenv("FANOUT_PRIVATE_INTERVAL", "1"))
+    FANOUT_GROUP_INTERVAL = float(getenv("FANOUT_GROUP_INTERVAL", "3"))
+
+    # Oversized non-video files are cut into plain byte parts of this size while they download
+    SPLIT_PART_MB = int(getenv("SPLIT_PART_MB", "1900"))
+
+    # Chat (id) shared by the bot and a premium user session; files of 2-4 GB are uploaded
+    # there by the user session and re-sent by the bot instead of being split
+    RELAY_CHAT_ID = int(getenv("RELAY_CHAT_ID", "0"))
+
+    # Move the moov atom of downloaded MP4s to the front before upload (faster playback start)
+    FASTSTART = getenv("FASTSTART", "true").lower() == "true"
+
+    # /mode encode: two-pass re-encode to fit one upload instead of splitting. Slower presets
+    # give better quality per byte at more CPU; 0 jobs/threads means derive from the CPU count
+    ENCODE_PRESET = getenv("ENCODE_PRESET", "veryfast")
+    ENCODE_AUDIO_KBPS = int(getenv("ENCODE_AUDIO_KBPS", "128"))
+    ENCODE_MAX_JOBS = int(getenv("ENCODE_MAX_JOBS", "0"))
+    ENCODE_THREADS = int(getenv("ENCODE_THREADS", "0"))
+    ENCODE_NICE = int(getenv("ENCODE_NICE", "10"))
+
+    # Disk janitor: sweep interval, age after which unclaimed leftovers are deleted,
+    # and an optional cap on downloads/ + Assets/ thumbnails together (0 = no cap)
+    JANITOR_INTERVAL = int(getenv("JANITOR_INTERVAL", "600"))
+    JANITOR_TTL_MIN = int(getenv("JANITOR_TTL_MIN", "60"))
+    DOWNLOADS_QUOTA_MB = int(getenv("DOWNLOADS_QUOTA_MB", "0"))
+
+    # Download roots as "path[:weight[:reserve_mb]]", comma separated, e.g.
+    # "/nvme/dl:3:20480,/array/dl:1:102400"; each file goes to a root with room for it
+    STORAGE_ROOTS = getenv("STORAGE_ROOTS", "downloads")
+
+    # Album items downloaded (and pre-uploaded) at the same time per media group
+    GROUP_CONCURRENCY = int(getenv("GROUP_CONCURRENCY", "3"))
+
+    # Resolved chats kept across restarts; the most recently used are loaded at startup
+    PEER_CACHE_PATH = getenv("PEER_CACHE_PATH", "Assets/peers.json")
+    PEER_CACHE_SIZE = int(getenv("PEER_CACHE_SIZE", "5000"))
+    PEER_CACHE_WARM = int(getenv("PEER_CACHE_WARM", "200"))
+
+    # Telethon keep-alive: ping interval, ping timeout and the longest reconnect backoff (seconds)
+    TELETHON_PING_INTERVAL = int(getenv("TELETHON_PING_INTERVAL", "60"))
+    TELETHON_PING_TIMEOUT = int(getenv("TELETHON_PING_TIMEOUT", "10"))
+    TELETHON_MAX_BACKOFF = int(getenv("TELETHON_MAX_BACKOFF", "300"))
+
+    # Extra user sessions (comma separated) that share source reads with SESSION_STRING;
+    # FloodWaits within SESSION_FLOOD_WINDOW seconds steer jobs to the other sessions
+    SESSION_STRINGS = [s.strip() for s in getenv("SESSION_STRINGS", "").split(",") if s.strip()]
+    SESSION_FLOOD_WINDOW = int(getenv("SESSION_FLOOD_WINDOW", "600"))
+
+    # Worker processes that run download jobs (0 = everything in this process) and the
+    # Unix socket the coordinator listens on for them
+    WORKERS = int(getenv("WORKERS", "0"))
+    WORKER_SOCKET = getenv("WORKER_SOCKET", "bt-coordinator.sock")
+
+    # /sync watermarks and how often (seconds) scheduled syncs are checked
+    SYNC_STATE_PATH = getenv("SYNC_STATE_PATH", "Assets/sync.json")
+    SYNC_CHECK_INTERVAL = int(getenv("SYNC_CHECK_INTERVAL", "60"))
+
+    # /watch list and how long (seconds) to wait for more items of an album before sending it
+    WATCH_LIST_PATH = getenv("WATCH_LIST_PATH", "Assets/watch.json")
+    WATCH_ALBUM_DELAY = float(getenv("WATCH_ALBUM_DELAY", "2"))
+
+    # /export archives and how many posts are downloaded into them at once
+    EXPORT_DIR = getenv("EXPORT_DIR", "exports")
+    EXPORT_CONCURRENCY = int(getenv("EXPORT_CONCURRENCY", "4"))
+
+    # /bdl ... pack: ranges with more text than this go out as one .txt document instead
+    TEXT_PACK_MAX_CHARS = int(getenv("TEXT_PACK_MAX_CHARS", "40000"))
@@ -0,0 +1,113 @@
+# bt/helpers/album.py
+# Upload album items as soon as they are downloaded, then send the album from the uploaded files
+
+import os
+from pyrogram import raw, utils
+from pyrogram.types import (
+    InputMediaPhoto,
+    InputMediaVideo,
+    InputMediaAudio,
+)
+from logger import LOGGER
+from helpers.concurrency import upload_limiter
+
+
+def _attributes(media):
+    file_name = os.path.basename(media.media)
+    if isinstance(media, InputMediaVideo):
+        return "video/mp4", [
+            raw.types.DocumentAttributeVideo(
+                supports_streaming=True,
+                duration=media.duration or 0,
+                w=media.width or 0,
+                h=media.height or 0,
+            ),
+            raw.types.DocumentAttributeFilename(file_name=file_name),
+        ]
+    if isinstance(media, InputMediaAudio):
+        return "audio/mpeg", [
+            raw.types.DocumentAttributeAudio(
+                duration=media.duration or 0,
+                performer=media.performer,
+                title=media.title,
+            ),
+            raw.types.DocumentAttributeFilename(file_name=file_name),
+        ]
+    return "application/zip", [raw.types.DocumentAttributeFilename(file_name=file_name)]
+
+
+async def preupload(bot, chat_id, media):
+    """
+    Upload one album item's file (save_file + UploadMedia) and return the raw
+    InputMedia that points at the stored photo/document, ready for SendMultiMedia.
+    """
+    peer = await bot.resolve_peer(chat_id)
+    async with upload_limiter.transfer(os.path.getsize(media.media)):
+        file = await bot.save_file(media.media)
+        if isinstance(media, InputMediaPhoto):
+            uploaded = await bot.invoke(
+                raw.functions.messages.UploadMedia(
+                    peer=peer,
+                    media=raw.types.InputMediaUploadedPhoto(file=file),
+                )
+            )
+            return raw.types.InputMediaPhoto(
+                id=raw.types.InputPhoto(
+                    id=uploaded.photo.id,
+                    access_hash=uploaded.photo.access_hash,
+                    file_reference=uploaded.photo.file_reference,
+                )
+            )
+
+        default_mime, attributes = _attributes(media)
+        thumb = getattr(media, "thumb", None)
+        uploaded = await bot.invoke(
+            raw.functions.messages.UploadMedia(
+                peer=peer,
+                media=raw.types.InputMediaUploadedDocument(
+                    file=file,
+                    thumb=await bot.save_file(thumb) if thumb else None,
+                    mime_type=bot.guess_mime_type(media.media) or default_mime,
+                    attributes=attributes,
+                ),
+            )
+        )
+    return raw.types.InputMediaDocument(
+        id=raw.types.InputDocument(
+            id=uploaded.document.id,
+            access_hash=uploaded.document.access_hash,
+            file_reference=uploaded.document.file_reference,
+        )
+    )
+
+
+async def send_preuploaded_group(bot, chat_id, items):
+    """Send [(InputMedia, raw media from preupload), ...] as one album, in order; returns the Messages"""
+    multi_media = []
+    for media, uploaded in items:
+        multi_media.append(
+            raw.types.InputSingleMedia(
+                media=uploaded,
+                random_id=bot.rnd_id(),
+                **(await utils.parse_text_entities(bot, media.caption, None, None)),
+            )
+        )
+    LOGGER(__name__).info(f"Sending album of {len(multi_media)} pre-uploaded item(s)")
+    r = await bot.invoke(
+        raw.functions.messages.SendMultiMedia(
+            peer=await bot.resolve_peer(chat_id),
+            multi_media=multi_media,
+        ),
+        sleep_threshold=60,
+    )
+    return await utils.parse_messages(
+        bot,
+        raw.types.messages.Messages(
+            messages=[
+                update.message for update in r.updates
+                if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage))
+            ],
+            users=r.users,
+            chats=r.chats,
+        ),
+    )
@@ -0,0 +1,67 @@
+# bt/helpers/batch.py
+# /bdl planning: fetch a range in bulk and turn it into one work item per post or album
+
+from typing import List, Optional
+from logger import LOGGER
+
+# messages.getMessages / channels.getMessages accept at most 200 ids per call
+BULK_FETCH_SIZE = 200
+
+
+class WorkItem:
+    """
+    One unit of /bdl work. `message` is the post handed to handle_download;
+    for an album it is the first item held and `album` is every item held,
+    in id order. `album` is None when the album crosses the edge of the
+    requested range, so processMediaGroup fetches the complete group itself.
+    """
+
+    def __init__(self, message, album: Optional[list] = None, ids: Optional[list] = None):
+        self.message = message
+        self.album = album
+        self.ids = [message.id] if ids is None else ids
+
+    @property
+    def media_group_id(self):
+        return self.message.media_group_id
+
+
+async def fetch_messages(client, chat_id, message_ids: List[int]) -> list:
+    """get_messages for every id, BULK_FETCH_SIZE ids per request; keeps the input order"""
+    messages = []
+    for start in range(0, len(message_ids), BULK_FETCH_SIZE):
+        chunk = message_ids[start:start + BULK_FETCH_SIZE]
+        fetched = await client.get_messages(chat_id=chat_id, message_ids=chunk)
+        messages.extend(fetched if isinstance(fetched, list) else [fetched])
+    LOGGER(__name__).info(f"Fetched {len(messages)} message(s) in {-(-len(message_ids) // BULK_FETCH_SIZE)} request(s)")
+    return messages
+
+
+def plan_batch(messages: list, first_id: int, last_id: int) -> List[WorkItem]:
+    """
+    Group already-fetched messages by media_group_id. Each album becomes a
+    single WorkItem at the position of its first item; everything else is
+    one WorkItem per message. Empty messages are left to the caller.
+    """
+    items = []
+    albums = {}
+    for msg in messages:
+        group_id = msg.media_group_id
+        if not group_id:
+            items.append(WorkItem(msg))
+            continue
+        item = albums.get(group_id)
+        if item is None:
+            item = albums[group_id] = WorkItem(msg, album=[], ids=[])
+            items.append(item)
+        item.album.append(msg)
+        item.ids.append(msg.id)
+
+    for item in albums.values():
+        item.album.sort(key=lambda m: m.id)
+        item.ids.sort()
+        item.message = item.album[0]
+        # An album touching either end of the range may have items outside it
+        if item.ids[0] == first_id or item.ids[-1] == last_id:
+            item.album = None
+    return items
@@ -0,0 +1,147 @@
+# bt/helpers/cache.py
+# Content-addressed local download cache with LRU eviction and pinning
+
+import os
+import json
+import shutil
+import hashlib
+from collections import OrderedDict, Counter
+from typing import Optional
+from logger import LOGGER
+from config import PyroConf
+from helpers.disk import disk_budget
+
+
+class DownloadCache:
+    """
+    Keeps downloaded files after upload so retries and repeat requests skip
+    the network. Entries live in <root>/<sha1(key)>/<original name> next to a
+    meta.json, are evicted least-recently-used first once the byte budget is
+    exceeded, and are never evicted while pinned by a running job.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # digest -> file path, oldest first
+        self._sizes = {}
+        self._owned = {}  # realpath -> digest, for owns() on every cleanup
+        self._pins = Counter()
+        if self.enabled:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _load(self):
+        """Rebuild the index from disk, most recently used last"""
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for digest in os.listdir(self.root):
+            meta_path = os.path.join(self.root, digest, "meta.json")
+            try:
+                with open(meta_path) as f:
+                    name = json.load(f)["name"]
+                path = os.path.join(self.root, digest, name)
+                found.append((os.path.getmtime(path), digest, path))
+            except (OSError, ValueError, KeyError):
+                shutil.rmtree(os.path.join(self.root, digest), ignore_errors=True)
+        for _, digest, path in sorted(found):
+            self._entries[digest] = path
+            self._sizes[digest] = os.path.getsize(path)
+            self._owned[os.path.realpath(path)] = digest
+        LOGGER(__name__).info(f"Download cache: {len(self._entries)} file(s), {self.total() / 1024**2:.1f} MiB")
+
+    def total(self) -> int:
+        return sum(self._sizes.values())
+
+    def owns(self, path: str) -> bool:
+        return bool(path) and os.path.realpath(path) in self._owned
+
+    def refresh(self, path: str):
+        """Re-read the size of a cached file that was rewritten in place (e.g. by faststart)"""
+        digest = self._owned.get(os.path.realpath(path)) if path else None
+        if digest is None:
+            return
+        try:
+            self._sizes[digest] = os.path.getsize(path)
+        except OSError:
+            return
+        self._evict()
+
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """Return a pinned cached path for key, or None on a miss"""
+        if not self.enabled or not key:
+            return None
+        digest = self._digest(key)
+        path = self._entries.get(digest)
+        if not path or not os.path.exists(path):
+            self._drop(digest)
+            return None
+        self._entries.move_to_end(digest)
+        os.utime(path)
+        self._pins[path] += 1
+        LOGGER(__name__).info(f"Cache hit for {key}: {path}")
+        return path
+
+    def adopt(self, key: Optional[str], path: str) -> str:
+        """Move a fresh download into the cache and return its new (pinned) path"""
+        if not self.enabled or not key or not os.path.exists(path):
+            return path
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return path
+        digest = self._digest(key)
+        folder = os.path.join(self.root, digest)
+        os.makedirs(folder, exist_ok=True)
+        cached_path = os.path.join(folder, os.path.basename(path))
+        shutil.move(path, cached_path)
+        with open(os.path.join(folder, "meta.json"), "w") as f:
+            json.dump({"key": key, "name": os.path.basename(path)}, f)
+        # The job's reservation follows the file: its bytes are on disk now, so only the split/encode
+        # headroom stays outstanding until the job's cleanup_download() of the cached path
+        disk_budget.move(path, cached_path)
+        self._entries[digest] = cached_path
+        self._entries.move_to_end(digest)
+        self._sizes[digest] = size
+        self._owned[os.path.realpath(cached_path)] = digest
+        self._pins[cached_path] += 1
+        self._evict()
+        return cached_path
+
+    def unpin(self, path: Optional[str]):
+        if not path or self._pins[path] <= 0:
+            return
+        self._pins[path] -= 1
+        if not self._pins[path]:
+            del self._pins[path]
+        self._evict()
+
+    def _drop(self, digest: str):
+        path = self._entries.pop(digest, None)
+        self._sizes.pop(digest, None)
+        if path:
+            self._owned.pop(os.path.realpath(path), None)
+        shutil.rmtree(os.path.join(self.root, digest), ignore_errors=True)
+        if path:
+            LOGGER(__name__).info(f"Evicted from cache: {path}")
+
+    def _evict(self):
+        for digest in list(self._entries):
+            if self.total() <= self.max_bytes:
+                break
+            if not self._pins[self._entries[digest]]:
+                self._drop(digest)
+
+    def status(self) -> str:
+        if not self.enabled:
+            return "disabled"
+        return f"{len(self._entries)} file(s), {self.total() / 1024**2:.1f}/{self.max_bytes / 1024**2:.0f} MiB"
+
+
+download_cache = DownloadCache(PyroConf.CACHE_DIR, PyroConf.CACHE_MAX_MB * 1024 * 1024)
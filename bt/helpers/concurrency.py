@@ -0,0 +1,147 @@
+# bt/helpers/concurrency.py
+# Adaptive (AIMD) concurrency limits for downloads and uploads
+
+import asyncio
+from time import time
+from contextlib import asynccontextmanager
+from pyrogram.errors import FloodWait
+from logger import LOGGER
+from config import PyroConf
+
+
+class Transfer:
+    """Handle yielded by AdaptiveLimiter.transfer(); set nbytes if unknown up front"""
+
+    def __init__(self, nbytes: int = 0):
+        self.nbytes = nbytes or 0
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter using additive-increase/multiplicative-decrease.
+    Every transfer completed while all slots were busy grows the limit by
+    `increase / limit` (about +1 per full window), FloodWait/timeouts or a sharp drop in per-transfer
+    throughput shrink it by `decrease`. Only transfers of at least
+    THROUGHPUT_MIN_BYTES are compared for throughput: small files never reach
+    steady-state speed, so they would look like a drop after every large one.
+    """
+
+    # Throughput below this fraction of the running average counts as congestion
+    THROUGHPUT_DROP = 0.5
+    # Transfers smaller than this grow the limit but are not throughput samples
+    THROUGHPUT_MIN_BYTES = 8 * 1024 * 1024
+    # Minimum seconds between two decreases, so one burst of errors only counts once
+    DECREASE_HOLD = 5
+
+    def __init__(self, name: str, initial: int, minimum: int = 1, maximum: int = 16,
+                 increase: float = 1.0, decrease: float = 0.5):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.avg_speed = 0.0
+        self.floodwaits = 0
+        self.timeouts = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @property
+    def slots(self) -> int:
+        return int(self.limit)
+
+    async def _acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.slots)
+            self.in_flight += 1
+
+    async def _release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _grow(self):
+        # A window that was not full says nothing about whether more slots would help
+        if self.in_flight >= self.slots:
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def _on_success(self, nbytes: int, elapsed: float):
+        if not nbytes or elapsed <= 0:
+            return
+        if nbytes < self.THROUGHPUT_MIN_BYTES:
+            self._grow()
+            return
+        speed = nbytes / elapsed
+        if self.avg_speed and speed < self.avg_speed * self.THROUGHPUT_DROP:
+            self._on_congestion(f"throughput dropped to {speed / 1024:.0f} KiB/s")
+        else:
+            self._grow()
+        self.avg_speed = speed if not self.avg_speed else 0.8 * self.avg_speed + 0.2 * speed
+
+    def _on_congestion(self, reason: str):
+        now = time()
+        if now - self._last_decrease < self.DECREASE_HOLD:
+            return
+        self._last_decrease = now
+        old = self.slots
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+        LOGGER(__name__).warning(f"{self.name} limit {old} -> {self.slots} ({reason})")
+
+    @asynccontextmanager
+    async def transfer(self, nbytes: int = 0):
+        """
+        Hold one slot for the duration of a transfer and feed its outcome back.
+        Only the transfer itself belongs inside: waits for disk space or
+        uploads would be timed as slow network throughput.
+        """
+        await self._acquire()
+        handle = Transfer(nbytes)
+        started = time()
+        try:
+            yield handle
+        except FloodWait as e:
+            self.floodwaits += 1
+            self._on_congestion(f"FloodWait {e.value}s")
+            raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._on_congestion("timeout")
+            raise
+        else:
+            self._on_success(handle.nbytes, time() - started)
+        finally:
+            await self._release()
+
+    def status(self) -> str:
+        return f"{self.in_flight}/{self.slots} (max {self.maximum})"
+
+
+class MemoryBudget:
+    """Byte budget for media held in memory; callers fall back to disk when it's spent"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.used = 0
+
+    def try_acquire(self, nbytes: int) -> bool:
+        if self.used + nbytes > self.capacity:
+            return False
+        self.used += nbytes
+        return True
+
+    def release(self, nbytes: int):
+        self.used = max(0, self.used - nbytes)
+
+    def status(self) -> str:
+        return f"{self.used / 1024**2:.1f}/{self.capacity / 1024**2:.0f} MiB"
+
+
+download_limiter = AdaptiveLimiter(
+    "Download", PyroConf.INITIAL_CONCURRENCY, maximum=PyroConf.MAX_CONCURRENT_DOWNLOADS
+)
+upload_limiter = AdaptiveLimiter(
+    "Upload", PyroConf.INITIAL_CONCURRENCY, maximum=PyroConf.MAX_CONCURRENT_UPLOADS
+)
+memory_budget = MemoryBudget(PyroConf.IN_MEMORY_CAP_MB * 1024 * 1024)
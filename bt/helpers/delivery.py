@@ -0,0 +1,103 @@
+# bt/helpers/delivery.py
+# Tracks what a job delivered, and shares in-flight jobs between identical requests
+
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from logger import LOGGER
+
+# Messages sent to the requester by the job running in the current task
+_sent_messages = contextvars.ContextVar("sent_messages", default=None)
+
+
+def record_sent(result):
+    """Remember a sent Message (or list of Messages) for the current job and return it unchanged"""
+    bucket = _sent_messages.get()
+    if bucket is not None and result:
+        bucket.extend(result if isinstance(result, list) else [result])
+    return result
+
+
+@contextmanager
+def collect_sent():
+    bucket = []
+    token = _sent_messages.set(bucket)
+    try:
+        yield bucket
+    finally:
+        _sent_messages.reset(token)
+
+
+async def run_and_collect(job, *args, **kwargs) -> list:
+    """Run a delivery job and return the messages it sent"""
+    with collect_sent() as sent:
+        await job(*args, **kwargs)
+    return list(sent)
+
+
+class SingleFlight:
+    """
+    Runs one job per key at a time. Callers that arrive while a job with the
+    same key is running don't start their own; they wait for the first one
+    and get its result (or its exception).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, job):
+        """Returns (result, shared); shared is True when another caller's job produced the result"""
+        while key in self._inflight:
+            future = self._inflight[key]
+            LOGGER(__name__).info(f"Attaching to in-flight job {key}")
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The first caller was cancelled (e.g. /killall); run the job ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await job()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # followers re-raise it; don't warn if there are none
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+async def deliver_copies(bot, chat_id: int, messages) -> None:
+    """Re-send already delivered messages to another chat without uploading again"""
+    done_groups = set()
+    for sent in messages:
+        if sent.media_group_id:
+            if sent.media_group_id in done_groups:
+                continue
+            done_groups.add(sent.media_group_id)
+            await bot.copy_media_group(chat_id, sent.chat.id, sent.id)
+        else:
+            await bot.copy_message(chat_id, sent.chat.id, sent.id)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for de-duplication (case, fragment and query order don't matter)"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+post_flights = SingleFlight()
+url_flights = SingleFlight()
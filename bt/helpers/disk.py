@@ -0,0 +1,136 @@
+# bt/helpers/disk.py
+# Disk-space admission control: reserve space before a download starts
+
+import os
+import shutil
+import asyncio
+from logger import LOGGER
+from config import PyroConf
+from helpers.relay import upload_relay
+
+
+class InsufficientDiskSpace(Exception):
+    pass
+
+
+class DiskBudget:
+    """
+    Tracks space promised to running jobs, per filesystem.
+    A job reserves its expected footprint (file size times the split factor)
+    before downloading; jobs that don't fit wait until a reservation is
+    released by cleanup_download().
+    """
+
+    # Re-check free space at least this often while waiting (other processes use the disk too)
+    POLL_INTERVAL = 30
+
+    def __init__(self, reserve_bytes: int):
+        self.reserve_bytes = reserve_bytes
+        self._reservations = {}  # realpath -> (device, bytes)
+        self._root_reserves = {}  # realpath of a storage root -> bytes kept free under it
+        self._changed = asyncio.Event()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.realpath(path)
+
+    @staticmethod
+    def _existing_dir(path: str) -> str:
+        folder = os.path.dirname(os.path.realpath(path))
+        while not os.path.exists(folder):
+            folder = os.path.dirname(folder)
+        return folder
+
+    def _device(self, path: str) -> int:
+        return os.stat(self._existing_dir(path)).st_dev
+
+    @staticmethod
+    def _on_disk(path: str) -> int:
+        written = 0
+        for candidate in (path, path + ".temp"):
+            if os.path.exists(candidate):
+                written += os.path.getsize(candidate)
+        return written
+
+    def _outstanding(self, device: int) -> int:
+        """Bytes promised on this device that are not written yet"""
+        return sum(
+            max(0, nbytes - self._on_disk(path))
+            for path, (dev, nbytes) in self._reservations.items()
+            if dev == device
+        )
+
+    def set_reserve(self, root: str, nbytes: int) -> None:
+        """Keep at least nbytes free on the filesystem of a storage root"""
+        self._root_reserves[os.path.realpath(root)] = nbytes
+
+    def _reserve_for(self, path: str) -> int:
+        reserve = self.reserve_bytes
+        for root, nbytes in self._root_reserves.items():
+            if path == root or path.startswith(root + os.sep):
+                reserve = max(reserve, nbytes)
+        return reserve
+
+    def _available(self, path: str, device: int) -> int:
+        free = shutil.disk_usage(self._existing_dir(path)).free
+        return free - self._reserve_for(path) - self._outstanding(device)
+
+    def available(self, path: str) -> int:
+        """Bytes that could still be reserved for path"""
+        key = self._key(path)
+        return self._available(key, self._device(key))
+
+    def paths(self) -> list:
+        return list(self._reservations)
+
+    def reserved(self) -> int:
+        return sum(nbytes for _, nbytes in self._reservations.values())
+
+    async def acquire(self, path: str, nbytes: int, on_wait=None) -> None:
+        """Reserve nbytes for path, waiting until it fits. Raises InsufficientDiskSpace if it never can."""
+        key = self._key(path)
+        device = self._device(key)
+        waited = False
+        while self._available(key, device) < nbytes:
+            if not any(dev == device for dev, _ in self._reservations.values()):
+                raise InsufficientDiskSpace(
+                    f"Not enough disk space: need {nbytes / 1024**3:.2f} GB, "
+                    f"{max(0, self._available(key, device)) / 1024**3:.2f} GB available"
+                )
+            if not waited:
+                waited = True
+                LOGGER(__name__).info(f"Waiting for disk space ({nbytes} bytes) for {path}")
+                if on_wait:
+                    await on_wait()
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=self.POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        self._reservations[key] = (device, nbytes)
+
+    def move(self, old_path: str, new_path: str) -> None:
+        """Re-key a reservation when the downloader picked a different file name"""
+        entry = self._reservations.pop(self._key(old_path), None)
+        if entry:
+            self._reservations[self._key(new_path)] = entry
+
+    def release(self, path: str) -> None:
+        if self._reservations.pop(self._key(path), None) is None:
+            return
+        # Wake every waiter, then arm a fresh event for the next release
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def status(self) -> str:
+        return f"{len(self._reservations)} job(s), {self.reserved() / 1024**3:.2f} GB"
+
+
+def estimate_footprint(file_size: int, split_threshold: int = 0) -> int:
+    """Bytes a job needs on disk: files above the split threshold (the upload limit) are written twice"""
+    if file_size > (split_threshold or upload_relay.upload_limit()):
+        return int(file_size * PyroConf.DISK_SPLIT_FACTOR)
+    return file_size
+
+
+disk_budget = DiskBudget(PyroConf.DISK_RESERVE_MB * 1024 * 1024)
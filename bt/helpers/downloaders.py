@@ -4,12 +4,19 @@
 import os
 import asyncio
 import json
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
 from logger import LOGGER
 from helpers.files import get_readable_file_size, get_download_path
 from helpers.utils import cmd_exec
+from helpers.disk import disk_budget, estimate_footprint
+from helpers.cache import download_cache
+from helpers.concurrency import download_limiter
 from config import PyroConf
 
+class DownloadFailed(Exception):
+    """Raised by a job when its downloader reported failure (the message is the downloader's error)"""
+    pass
+
 async def save_cookies(cookies_text: str) -> bool:
     """
     Save cookies in Netscape format to a file
@@ -54,12 +61,42 @@ async def save_cookies(cookies_text: str) -> bool:
         LOGGER(__name__).error(f"Error saving cookies: {e}")
         return False
 
-async def aria2c_download(url: str, download_path: str, progress_callback=None) -> Tuple[bool, str]:
+async def get_remote_file_info(url: str) -> Tuple[int, str]:
+    """Return (Content-Length, ETag) from a HEAD request; (0, "") when the server doesn't say"""
+    from urllib.request import Request, urlopen
+
+    def _head():
+        request = Request(url, method="HEAD", headers={"User-Agent": "Mozilla/5.0"})
+        with urlopen(request, timeout=15) as response:
+            return int(response.headers.get("Content-Length") or 0), response.headers.get("ETag") or ""
+
+    try:
+        return await asyncio.to_thread(_head)
+    except Exception as e:
+        LOGGER(__name__).info(f"Could not get remote file info for {url}: {e}")
+        return 0, ""
+
+async def get_remote_file_size(url: str) -> int:
+    """Return Content-Length from a HEAD request, or 0 if the server doesn't say"""
+    return (await get_remote_file_info(url))[0]
+
+async def _wait_for_disk_message(progress_message):
+    if progress_message:
+        await progress_message.edit("**⏳ Waiting for free disk space...**")
+
+async def aria2c_download(url: str, download_path: str, progress_callback=None, progress_message=None,
+                          file_size: int = 0) -> Tuple[bool, str]:
     """
     Download file using aria2c
-
+    Reserves disk space first; the reservation is released by cleanup_download()
     """
     try:
+        file_size = file_size or await get_remote_file_size(url) or PyroConf.DISK_UNKNOWN_SIZE_MB * 1024 * 1024
+        await disk_budget.acquire(
+            download_path,
+            estimate_footprint(file_size),
+            on_wait=lambda: _wait_for_disk_message(progress_message),
+        )
         cmd = [
             "aria2c",
             "--load-cookies=/home/user/kolo/bt/cookies.txt",
@@ -79,17 +116,21 @@ async def aria2c_download(url: str, download_path: str, progress_callback=None)
         
         LOGGER(__name__).info(f"Starting aria2c download: {url}")
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Monitor progress if callback provided
-        if progress_callback:
-            asyncio.create_task(_monitor_aria2c_progress(process, progress_callback))
-        
-        stdout, stderr = await process.communicate()
+        # Only the transfer itself holds a download slot (and is timed), not the wait for disk space
+        async with download_limiter.transfer() as transfer:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            
+            # Monitor progress if callback provided
+            if progress_callback:
+                asyncio.create_task(_monitor_aria2c_progress(process, progress_callback))
+            
+            stdout, stderr = await process.communicate()
+            if process.returncode == 0 and os.path.exists(download_path):
+                transfer.nbytes = os.path.getsize(download_path)
         
         if process.returncode == 0:
             LOGGER(__name__).info(f"Successfully downloaded: {download_path}")
@@ -97,12 +138,46 @@ async def aria2c_download(url: str, download_path: str, progress_callback=None)
         else:
             error_msg = stderr.decode() if stderr else "Unknown error"
             LOGGER(__name__).error(f"aria2c download failed: {error_msg}")
+            disk_budget.release(download_path)
             return False, error_msg
             
     except Exception as e:
         LOGGER(__name__).error(f"Error in aria2c download: {e}")
+        disk_budget.release(download_path)
         return False, str(e)
 
+async def stream_download(url: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """
+    Yield the bytes of url while they download (yt-dlp writing to stdout).
+    aria2c can only write to files, so streamed downloads go through yt-dlp's native downloader.
+    """
+    cmd = ["yt-dlp", "--no-playlist", "--no-part", "--no-warnings", "--quiet", "--no-progress", "-o", "-"]
+    if os.path.exists(PyroConf.COOKIES_FILE):
+        cmd.extend(["--cookies", PyroConf.COOKIES_FILE])
+    cmd.append(url)
+
+    LOGGER(__name__).info(f"Starting streamed download: {url}")
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        while True:
+            data = await process.stdout.read(chunk_size)
+            if not data:
+                break
+            yield data
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            error_msg = stderr.decode(errors="replace").strip() or "Unknown error"
+            LOGGER(__name__).error(f"Streamed download failed: {error_msg}")
+            raise DownloadFailed(error_msg)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
 async def _monitor_aria2c_progress(process, callback):
     """Monitor aria2c download progress"""
     while process.returncode is None:
@@ -139,11 +214,16 @@ async def ytdlp_download(url: str, download_path: str, use_aria2c: bool = True,
         stdout, stderr = await process.communicate()
         
         video_title = None
+        expected_size = 0
+        cache_key = None
         if stdout:
             try:
                 import json
                 video_info = json.loads(stdout.decode())
                 video_title = video_info.get('title', '')
+                expected_size = int(video_info.get('filesize') or video_info.get('filesize_approx') or 0)
+                if video_info.get('id'):
+                    cache_key = f"ytdlp:{video_info.get('extractor_key')}:{video_info['id']}:{video_info.get('format_id')}"
                 
                 # Sanitize title for use as caption
                 # if video_title:
@@ -191,6 +271,18 @@ async def ytdlp_download(url: str, download_path: str, use_aria2c: bool = True,
         if not video_title:
             LOGGER(__name__).info("Could not extract video title")
         
+        # Same video and format already downloaded: serve it from the cache (pinned for the caller)
+        cached_file = download_cache.lookup(cache_key)
+        if cached_file:
+            return True, cached_file, video_title
+        
+        # Reserve disk space from the size yt-dlp reported (or a conservative default)
+        await disk_budget.acquire(
+            download_path,
+            estimate_footprint(expected_size or PyroConf.DISK_UNKNOWN_SIZE_MB * 1024 * 1024),
+            on_wait=lambda: _wait_for_disk_message(progress_message),
+        )
+        
         # Now download the video
         cmd = [
             "yt-dlp",
@@ -228,54 +320,61 @@ async def ytdlp_download(url: str, download_path: str, use_aria2c: bool = True,
         if progress_message:
             await progress_message.edit("**📥 Downloading with yt-dlp...**")
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Read output in real-time for progress
-        last_percent = 0
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
+        async with download_limiter.transfer() as transfer:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
             
-            line = line.decode().strip()
-            if '[download]' in line and '%' in line and progress_message:
-                try:
-                    # Extract percentage
-                    percent_str = line.split('%')[0].split()[-1]
-                    current_percent = float(percent_str)
+            # Read output in real-time for progress
+            last_percent = 0
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+            
+                line = line.decode().strip()
+                if '[download]' in line and '%' in line and progress_message:
+                    try:
+                        # Extract percentage
+                        percent_str = line.split('%')[0].split()[-1]
+                        current_percent = float(percent_str)
                     
-                    # Only update if percentage changed significantly (reduce spam)
-                    if current_percent - last_percent >= 5:
-                        if video_title:
-                            await progress_message.edit(f"**📥 Downloading: {percent_str}%**\n📹 {video_title[:50]}...")
-                        else:
-                            await progress_message.edit(f"**📥 Downloading: {percent_str}%**")
-                        last_percent = current_percent
-                except:
-                    pass
-        
-        await process.wait()
+                        # Only update if percentage changed significantly (reduce spam)
+                        if current_percent - last_percent >= 5:
+                            if video_title:
+                                await progress_message.edit(f"**📥 Downloading: {percent_str}%**\n📹 {video_title[:50]}...")
+                            else:
+                                await progress_message.edit(f"**📥 Downloading: {percent_str}%**")
+                            last_percent = current_percent
+                    except:
+                        pass
+            
+            await process.wait()
+            if process.returncode == 0:
+                actual_file = _find_downloaded_file(os.path.dirname(download_path), os.path.basename(download_path))
+                transfer.nbytes = os.path.getsize(actual_file) if actual_file else 0
         
         if process.returncode == 0:
-            # Find the actual downloaded file
-            actual_file = _find_downloaded_file(os.path.dirname(download_path), os.path.basename(download_path))
+            # actual_file is the downloaded file found above (yt-dlp may change the extension)
             if actual_file:
                 LOGGER(__name__).info(f"Successfully downloaded: {actual_file}")
-                return True, actual_file, video_title
+                disk_budget.move(download_path, actual_file)
+                return True, download_cache.adopt(cache_key, actual_file), video_title
             else:
+                disk_budget.release(download_path)
                 return False, "Downloaded file not found", None
         else:
             stderr_data = await process.stderr.read()
             error_msg = stderr_data.decode() if stderr_data else "Unknown error"
             LOGGER(__name__).error(f"yt-dlp download failed: {error_msg}")
+            disk_budget.release(download_path)
             return False, error_msg, None
             
     except Exception as e:
         LOGGER(__name__).error(f"Error in yt-dlp download: {e}")
+        disk_budget.release(download_path)
         return False, str(e), None
         
 def _find_downloaded_file(directory: str, base_name: str) -> Optional[str]:
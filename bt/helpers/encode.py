@@ -0,0 +1,127 @@
+# bt/helpers/encode.py
+# "One file" mode: two-pass re-encode to fit the upload limit instead of splitting
+
+import os
+import asyncio
+from typing import Optional
+from logger import LOGGER
+from config import PyroConf
+from helpers.files import cleanup_download, get_readable_file_size
+
+# Container overhead and rate-control slack; the encode aims a little under the limit
+SIZE_HEADROOM = 0.96
+# Below this the picture is not worth watching; split instead
+MIN_VIDEO_KBPS = 200
+
+
+class EncodeScheduler:
+    """
+    Runs at most `jobs` encodes at once, each with `threads` ffmpeg threads,
+    under nice so downloads, uploads and the bot itself keep getting CPU.
+    By default one core is always left free for everything else.
+    """
+
+    def __init__(self, jobs: int = 0, threads: int = 0):
+        cpus = os.cpu_count() or 1
+        spare = max(1, cpus - 1)
+        self.jobs = jobs or max(1, spare // 4)
+        self.threads = threads or max(1, spare // self.jobs)
+        self._slots = asyncio.Semaphore(self.jobs)
+        self.running = 0
+        self.waiting = 0
+
+    async def run(self, cmd: list):
+        from helpers.utils import cmd_exec
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await cmd_exec(["nice", "-n", str(PyroConf.ENCODE_NICE), *cmd])
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def status(self) -> str:
+        return f"{self.running}/{self.jobs} running ({self.threads} threads each), {self.waiting} waiting"
+
+
+encode_scheduler = EncodeScheduler(PyroConf.ENCODE_MAX_JOBS, PyroConf.ENCODE_THREADS)
+
+# Users who chose one re-encoded file over split parts (/mode)
+_encode_users = set()
+
+
+def wants_single_file(user_id) -> bool:
+    return user_id in _encode_users
+
+
+def set_single_file(user_id, enabled: bool):
+    if enabled:
+        _encode_users.add(user_id)
+    else:
+        _encode_users.discard(user_id)
+
+
+def target_video_kbps(duration: int, target_bytes: int) -> int:
+    """Video bitrate that makes duration seconds of video plus audio fit in target_bytes"""
+    if duration <= 0:
+        return 0
+    total_kbps = target_bytes * 8 * SIZE_HEADROOM / duration / 1000
+    return int(total_kbps - PyroConf.ENCODE_AUDIO_KBPS)
+
+
+async def encode_to_size(path: str, target_bytes: int, progress_message=None) -> Optional[str]:
+    """
+    Two-pass x264 re-encode of path so the result fits in target_bytes.
+    Returns the new file's path, or None when it can't be done sensibly
+    (unknown duration, bitrate too low to be watchable, ffmpeg failure, still too big).
+    """
+    from helpers.utils import get_media_info
+
+    duration = (await get_media_info(path))[0]
+    video_kbps = target_video_kbps(duration, target_bytes)
+    if video_kbps < MIN_VIDEO_KBPS:
+        LOGGER(__name__).info(f"Not re-encoding {path}: {video_kbps} kbps over {duration}s is too low")
+        return None
+
+    base = os.path.splitext(path)[0]
+    output_path = f"{base}_encoded.mp4"
+    passlog = f"{base}_passlog"
+    common = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", PyroConf.ENCODE_PRESET,
+        "-b:v", f"{video_kbps}k",
+        "-threads", str(encode_scheduler.threads),
+        "-passlogfile", passlog,
+    ]
+
+    LOGGER(__name__).info(f"Re-encoding {path} at {video_kbps} kbps to fit {get_readable_file_size(target_bytes)}")
+    try:
+        for pass_number, tail in (
+            (1, ["-pass", "1", "-an", "-f", "null", os.devnull]),
+            (2, ["-pass", "2", "-c:a", "aac", "-b:a", f"{PyroConf.ENCODE_AUDIO_KBPS}k",
+                 "-movflags", "+faststart", output_path]),
+        ):
+            if progress_message:
+                await progress_message.edit(f"**🎞️ Re-encoding to fit one upload (pass {pass_number}/2)...**")
+            _, stderr, returncode = await encode_scheduler.run(common + tail)
+            if returncode != 0:
+                LOGGER(__name__).error(f"Re-encode pass {pass_number} failed for {path}: {stderr}")
+                cleanup_download(output_path)
+                return None
+    finally:
+        for suffix in ("-0.log", "-0.log.mbtree"):
+            if os.path.exists(passlog + suffix):
+                os.remove(passlog + suffix)
+
+    if not os.path.exists(output_path) or os.path.getsize(output_path) > target_bytes:
+        LOGGER(__name__).warning(f"Re-encoded {path} still does not fit; falling back to splitting")
+        cleanup_download(output_path)
+        return None
+    LOGGER(__name__).info(f"Re-encoded {path}: {get_readable_file_size(os.path.getsize(output_path))}")
+    return output_path
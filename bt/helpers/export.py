@@ -0,0 +1,130 @@
+# bt/helpers/export.py
+# /export: archive a range of posts to local disk with a JSON-lines manifest, no uploads
+
+import os
+import re
+import json
+import asyncio
+from logger import LOGGER
+from config import PyroConf
+from helpers.concurrency import download_limiter
+from helpers.disk import disk_budget
+from helpers.msg import get_file_name, has_file
+
+
+def _safe(name) -> str:
+    return re.sub(r"[^\w.@+-]+", "_", str(name)).strip("._") or "_"
+
+
+class ChatExport:
+    """
+    Writes posts of one (chat, topic) under <EXPORT_DIR>/<chat>/<topic>/<post id>/
+    and appends one manifest.jsonl line per message (album items each get
+    their own line, in their album's folder). Files already on disk with the
+    expected size are kept, so an interrupted export can simply be re-run.
+    Nothing is thumbnailed, split, re-encoded or uploaded.
+    """
+
+    def __init__(self, root: str, chat_id, thread_id, prefix: str):
+        self.folder = os.path.join(root, _safe(chat_id), str(thread_id or 0))
+        self.manifest_path = os.path.join(self.folder, "manifest.jsonl")
+        self.prefix = prefix
+        self.files = 0
+        self.bytes = 0
+        self.kept = 0
+        self._manifest_lock = asyncio.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._recorded = self._recorded_ids()
+
+    def _recorded_ids(self) -> set:
+        """Message ids already in the manifest from an earlier run"""
+        ids = set()
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ids.add(json.loads(line)["id"])
+                    except (ValueError, KeyError):
+                        continue
+        except OSError:
+            pass
+        return ids
+
+    async def _download(self, msg, post_dir: str):
+        media = getattr(msg, msg.media.value, None)
+        size = getattr(media, "file_size", 0) or 0
+        target = os.path.join(post_dir, f"{msg.id}_{_safe(get_file_name(msg.id, msg))}")
+        if size and os.path.exists(target) and os.path.getsize(target) == size:
+            self.kept += 1
+            return target, size
+        await disk_budget.acquire(target, size)
+        try:
+            async with download_limiter.transfer(size):
+                path = await msg.download(file_name=target)
+        finally:
+            disk_budget.release(target)
+        size = os.path.getsize(path)
+        self.files += 1
+        self.bytes += size
+        return path, size
+
+    async def _record(self, msg, path, size):
+        if msg.id in self._recorded:
+            return
+        self._recorded.add(msg.id)
+        text = msg.caption or msg.text or ""
+        entry = {
+            "id": msg.id,
+            "date": msg.date.isoformat() if msg.date else None,
+            "link": f"{self.prefix}/{msg.id}",
+            "media_group_id": msg.media_group_id,
+            "media": msg.media.value if msg.media else None,
+            "file": os.path.relpath(path, self.folder) if path else None,
+            "size": size,
+            "text": str(text),
+            "views": msg.views,
+        }
+        async with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def export_item(self, message, album=None):
+        """Archive one post, or all of an album when album (or the message's media group) is given"""
+        if album is None and message.media_group_id:
+            album = await message.get_media_group()
+        post_dir = os.path.join(self.folder, str(message.id))
+        for msg in album or [message]:
+            path, size = None, 0
+            # Link previews, polls, locations and contacts have nothing to download
+            if has_file(msg):
+                os.makedirs(post_dir, exist_ok=True)
+                path, size = await self._download(msg, post_dir)
+            await self._record(msg, path, size)
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} file(s), {self.bytes / 1024**2:.1f} MiB downloaded"
+            + (f", {self.kept} already on disk" if self.kept else "")
+        )
+
+
+async def export_items(export: ChatExport, items: list, on_error=None) -> int:
+    """Export work items (helpers/batch.py) EXPORT_CONCURRENCY at a time; returns how many failed"""
+    slots = asyncio.Semaphore(PyroConf.EXPORT_CONCURRENCY)
+    failed = 0
+
+    async def run(item):
+        nonlocal failed
+        async with slots:
+            try:
+                await export.export_item(item.message, item.album)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failed += 1
+                LOGGER(__name__).error(f"Export of {export.prefix}/{item.message.id} failed: {e}")
+                if on_error is not None:
+                    await on_error(item, e)
+
+    await asyncio.gather(*(run(item) for item in items))
+    return failed
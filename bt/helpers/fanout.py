@@ -0,0 +1,146 @@
+# bt/helpers/fanout.py
+# Upload once, deliver to many chats by file_id
+
+import asyncio
+from time import time
+from pyrogram.errors import FloodWait
+from pyrogram.enums import ChatType
+from pyrogram.types import (
+    InputMediaPhoto,
+    InputMediaVideo,
+    InputMediaDocument,
+    InputMediaAudio,
+)
+from logger import LOGGER
+from config import PyroConf
+
+_INPUT_MEDIA = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+}
+
+# Re-sends of one batch after a FloodWait before that chat's batch is given up
+FLOODWAIT_RETRIES = 2
+
+
+class ChatPacer:
+    """Keeps a minimum gap between sends to the same chat (Telegram allows ~20 msgs/min in groups)"""
+
+    def __init__(self, private_interval: float, group_interval: float):
+        self.private_interval = private_interval
+        self.group_interval = group_interval
+        self._next_send = {}
+        self._locks = {}
+
+    async def wait(self, chat_id, is_private: bool):
+        lock = self._locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            delay = self._next_send.get(chat_id, 0) - time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            interval = self.private_interval if is_private else self.group_interval
+            self._next_send[chat_id] = time() + interval
+
+
+pacer = ChatPacer(PyroConf.FANOUT_PRIVATE_INTERVAL, PyroConf.FANOUT_GROUP_INTERVAL)
+
+
+def _file_id(message):
+    media = getattr(message, message.media.value, None) if message.media else None
+    return getattr(media, "file_id", None)
+
+
+def _as_input_media(message):
+    input_type = _INPUT_MEDIA.get(message.media.value, InputMediaDocument)
+    return input_type(
+        media=_file_id(message),
+        caption=message.caption or "",
+        caption_entities=message.caption_entities,
+    )
+
+
+def _batches(messages):
+    """Split delivered messages into single messages and albums, keeping their order"""
+    batches = []
+    for message in messages:
+        if message.media_group_id and batches and batches[-1][0].media_group_id == message.media_group_id:
+            batches[-1].append(message)
+        else:
+            batches.append([message])
+    return batches
+
+
+async def _send_batch(bot, chat_id, batch):
+    first = batch[0]
+    if len(batch) > 1:
+        await bot.send_media_group(chat_id, [_as_input_media(m) for m in batch])
+    elif _file_id(first):
+        await bot.send_cached_media(
+            chat_id,
+            _file_id(first),
+            caption=first.caption or "",
+            caption_entities=first.caption_entities,
+        )
+    elif first.text:
+        await bot.send_message(chat_id, first.text, entities=first.entities)
+
+
+async def _deliver_to_chat(bot, chat_id, batches) -> int:
+    try:
+        chat = await bot.get_chat(chat_id)
+        is_private = chat.type in (ChatType.PRIVATE, ChatType.BOT)
+    except Exception as e:
+        LOGGER(__name__).error(f"Fan-out: cannot access chat {chat_id}: {e}")
+        return 0
+
+    delivered = 0
+    for batch in batches:
+        await pacer.wait(chat_id, is_private)
+        for attempt in range(1, FLOODWAIT_RETRIES + 2):
+            try:
+                await _send_batch(bot, chat_id, batch)
+            except FloodWait as e:
+                if attempt > FLOODWAIT_RETRIES:
+                    LOGGER(__name__).error(f"Fan-out to {chat_id} gave up after {attempt} FloodWait(s)")
+                    break
+                LOGGER(__name__).warning(f"Fan-out FloodWait {e.value}s for chat {chat_id}")
+                await asyncio.sleep(e.value)
+                continue
+            except Exception as e:
+                LOGGER(__name__).error(f"Fan-out to {chat_id} failed: {e}")
+                break
+            delivered += 1
+            break
+    return delivered
+
+
+async def fan_out(bot, messages, chat_ids) -> int:
+    """
+    Re-send already uploaded messages to every chat in chat_ids by file_id,
+    so no bytes are uploaded again. Chats are served in parallel; sends
+    to any one chat are paced. Returns the number of chats that got everything.
+    """
+    if not messages or not chat_ids:
+        return 0
+    batches = _batches(messages)
+    results = await asyncio.gather(*(_deliver_to_chat(bot, chat_id, batches) for chat_id in chat_ids))
+    return sum(1 for delivered in results if delivered == len(batches))
+
+
+def parse_destinations(values) -> list:
+    """Chat ids or @usernames, as given on a command line or in FANOUT_CHATS"""
+    destinations = []
+    for value in values:
+        value = value.strip().strip(",")
+        if not value:
+            continue
+        try:
+            destinations.append(int(value))
+        except ValueError:
+            destinations.append(value.lstrip("@"))
+    return destinations
+
+
+default_destinations = parse_destinations(PyroConf.FANOUT_CHATS.replace(",", " ").split())
@@ -0,0 +1,162 @@
+# bt/helpers/faststart.py
+# Move the MP4 moov atom in front of mdat so Telegram clients can start playback right away
+
+import os
+import shutil
+import struct
+import asyncio
+from typing import List, Optional, Tuple
+from logger import LOGGER
+from config import PyroConf
+from helpers.cache import download_cache
+from helpers.mediaprobe import MP4_EXTENSIONS, MAX_MOOV_SIZE, _iter_boxes
+
+# Boxes inside moov that can (directly or indirectly) contain stco/co64
+_CONTAINERS = {b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _top_level_boxes(f) -> List[Tuple[bytes, int, int]]:
+    """(type, offset, size) of every top-level box"""
+    file_size = os.fstat(f.fileno()).st_size
+    boxes = []
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            break
+        boxes.append((kind, offset, size))
+        offset += size
+    return boxes
+
+
+def needs_faststart(path: str) -> bool:
+    """True for an MP4 whose moov comes after its mdat"""
+    if os.path.splitext(path)[1].lower() not in MP4_EXTENSIONS:
+        return False
+    try:
+        with open(path, "rb") as f:
+            order = [kind for kind, _, _ in _top_level_boxes(f)]
+    except (OSError, struct.error):
+        return False
+    if b"moov" not in order or b"mdat" not in order:
+        return False
+    return order.index(b"moov") > order.index(b"mdat")
+
+
+def _patch_chunk_offsets(moov: bytearray, start: int, end: int, shift: int, below: int) -> bool:
+    """
+    Add shift to every stco/co64 entry pointing before file offset `below`
+    (data after it does not move); False when a 32-bit offset would overflow
+    """
+    for kind, body_start, body_end in _iter_boxes(moov, start, end):
+        if kind in _CONTAINERS:
+            if not _patch_chunk_offsets(moov, body_start, body_end, shift, below):
+                return False
+        elif kind == b"cmov":  # compressed moov, leave it to ffmpeg
+            return False
+        elif kind in (b"stco", b"co64"):
+            count = struct.unpack_from(">I", moov, body_start + 4)[0]
+            fmt, width = (">I", 4) if kind == b"stco" else (">Q", 8)
+            position = body_start + 8
+            for _ in range(count):
+                value = struct.unpack_from(fmt, moov, position)[0]
+                if value < below:
+                    value += shift
+                if kind == b"stco" and value > 0xFFFFFFFF:
+                    return False
+                struct.pack_into(fmt, moov, position, value)
+                position += width
+    return True
+
+
+def _relocate_moov(path: str, output_path: str) -> bool:
+    """
+    Rewrite path into output_path as [boxes before mdat] + moov + [everything else]
+    in one sequential copy. Chunks stored before the old moov position move
+    forward by the size of moov; chunks after it (when moov sat between two
+    mdats) keep their offsets.
+    """
+    with open(path, "rb") as src:
+        boxes = _top_level_boxes(src)
+        moov_box = next(box for box in boxes if box[0] == b"moov")
+        _, moov_offset, moov_size = moov_box
+        if moov_size > MAX_MOOV_SIZE:
+            return False
+        src.seek(moov_offset)
+        moov = bytearray(src.read(moov_size))
+        header_size = 16 if struct.unpack_from(">I", moov)[0] == 1 else 8
+        if not _patch_chunk_offsets(moov, header_size, moov_size, moov_size, moov_offset):
+            return False
+
+        first_mdat = next(i for i, box in enumerate(boxes) if box[0] == b"mdat")
+        head = [box for box in boxes[:first_mdat] if box[0] != b"moov"]
+        tail = [box for box in boxes[first_mdat:] if box is not moov_box]
+        with open(output_path, "wb") as dst:
+            for _, offset, size in head:
+                src.seek(offset)
+                dst.write(src.read(size))
+            dst.write(moov)
+            for _, offset, size in tail:
+                src.seek(offset)
+                remaining = size
+                while remaining:
+                    chunk = src.read(min(remaining, 8 * 1024 * 1024))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+    return True
+
+
+async def _ffmpeg_faststart(path: str, output_path: str) -> bool:
+    from helpers.utils import cmd_exec
+    _, stderr, returncode = await cmd_exec([
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", path, "-map", "0", "-c", "copy", "-movflags", "+faststart",
+        "-y", output_path,
+    ])
+    if returncode != 0:
+        LOGGER(__name__).error(f"ffmpeg faststart failed for {path}: {stderr}")
+    return returncode == 0
+
+
+async def ensure_faststart(path: str) -> Optional[str]:
+    """
+    Relocate moov to the front of an MP4 in place, only when it's at the end.
+    Returns the path, or None when nothing was done (disabled, already fast-start,
+    not an MP4, not enough disk for the temporary copy, or both methods failed).
+    """
+    if not PyroConf.FASTSTART or not await asyncio.to_thread(needs_faststart, path):
+        return None
+    file_size = os.path.getsize(path)
+    if shutil.disk_usage(os.path.dirname(path) or ".").free < file_size + PyroConf.DISK_RESERVE_MB * 1024 * 1024:
+        LOGGER(__name__).info(f"Skipping faststart for {path}: not enough free disk for the copy")
+        return None
+
+    output_path = f"{path}.faststart.mp4"
+    try:
+        done = await asyncio.to_thread(_relocate_moov, path, output_path)
+        if not done:
+            LOGGER(__name__).info(f"Falling back to ffmpeg faststart for {path}")
+            done = await _ffmpeg_faststart(path, output_path)
+        if not done:
+            return None
+        os.replace(output_path, path)
+        # A cached file keeps its new size in the cache budget
+        download_cache.refresh(path)
+        LOGGER(__name__).info(f"Moved moov to the front of {path}")
+        return path
+    except Exception as e:
+        LOGGER(__name__).error(f"Faststart failed for {path}: {e}")
+        return None
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
@@ -5,18 +5,30 @@ import os
 from typing import Optional
 
 from logger import LOGGER
+from helpers.disk import disk_budget
+from helpers.cache import download_cache
+from helpers.relay import BOT_UPLOAD_LIMIT, PREMIUM_UPLOAD_LIMIT
+from helpers.janitor import janitor
+from helpers.storage import storage
 
 SIZE_UNITS = ["B", "KB", "MB", "GB", "TB", "PB"]
 
-def get_download_path(folder_id: int, filename: str, root_dir: str = "downloads") -> str:
-    folder = os.path.join(root_dir, str(folder_id))
+def get_download_path(folder_id: int, filename: str, root_dir: Optional[str] = None, expected_size: int = 0) -> str:
+    # Without an explicit root, place the file on the storage root with room for expected_size
+    folder = os.path.join(root_dir or storage.pick(expected_size), str(folder_id))
     os.makedirs(folder, exist_ok=True)
+    # Everything in the job folder belongs to the calling task until it finishes
+    janitor.claim(folder)
     return os.path.join(folder, filename)
 
 
 def cleanup_download(path: str) -> None:
     try:
         LOGGER(__name__).info(f"Cleaning Download: {path}")
+        disk_budget.release(path)
+        if download_cache.owns(path):
+            # Kept for later requests; the job unpins it when it finishes
+            return
         
         if os.path.exists(path):
             os.remove(path)
@@ -63,7 +75,8 @@ def get_readable_time(seconds: int) -> str:
 
 
 async def fileSizeLimit(file_size, message, action_type="download", is_premium=False):
-    MAX_FILE_SIZE = 2 * 2097152000 if is_premium else 2*2097152000
+    # Any account can download files up to 4GB; uploading more than 2GB needs the premium relay
+    MAX_FILE_SIZE = PREMIUM_UPLOAD_LIMIT if is_premium or action_type == "download" else BOT_UPLOAD_LIMIT
     if file_size > MAX_FILE_SIZE:
         await message.reply(
             f"The file size exceeds the {get_readable_file_size(MAX_FILE_SIZE)} limit and cannot be {action_type}ed."
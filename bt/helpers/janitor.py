@@ -0,0 +1,173 @@
+# bt/helpers/janitor.py
+# Background sweeper for files left behind by failed or cancelled jobs
+
+import os
+import asyncio
+from time import time
+from fnmatch import fnmatch
+from logger import LOGGER
+from config import PyroConf
+from helpers.disk import disk_budget
+from helpers.storage import storage
+
+
+class Janitor:
+    """
+    Paths are claimed by the asyncio task that creates them (job folders in
+    get_download_path, thumbnails in get_video_thumbnail). A periodic sweep
+    deletes everything under the managed roots that no live task claims and
+    no disk reservation covers, once it is older than the TTL, or right away
+    when the task that claimed it has finished. If the trees are still over
+    quota, unprotected files are deleted oldest first.
+    """
+
+    def __init__(self, roots: dict, ttl: float, quota_bytes: int, interval: float):
+        self.roots = roots  # directory -> file name pattern that may be swept
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self._claims = {}  # realpath -> set of owner tasks
+        self._released = set()  # claimed paths whose owners have all finished
+        self.reclaimed_bytes = 0
+        self.reclaimed_files = 0
+        self.last_sweep = 0.0
+        self.usage = 0
+        self._task = None
+        self._wake = None
+
+    def claim(self, path: str) -> str:
+        """Mark path (a file, or a folder and everything in it) as in use by the current task"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:  # no running loop: nothing to tie the path to
+            return path
+        if task is None:
+            return path
+        key = os.path.realpath(path)
+        owners = self._claims.setdefault(key, set())
+        if task not in owners:
+            owners.add(task)
+            task.add_done_callback(lambda t, key=key: self._drop_owner(key, t))
+        self._released.discard(key)
+        return path
+
+    def _drop_owner(self, key: str, task):
+        owners = self._claims.get(key)
+        if owners is None:
+            return
+        owners.discard(task)
+        if not owners:
+            del self._claims[key]
+            self._released.add(key)
+
+    def _protected(self) -> list:
+        return list(self._claims) + [os.path.dirname(path) for path in disk_budget.paths()]
+
+    @staticmethod
+    def _covered(path: str, protected: list) -> bool:
+        return any(path == p or path.startswith(p + os.sep) for p in protected)
+
+    def _claimed_now(self, path: str) -> bool:
+        """Re-check live claims, which may have been made while the scan was running"""
+        while True:
+            if path in self._claims:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def _scan(self, protected: list, released: set):
+        """Runs in a worker thread; returns (bytes, files) reclaimed and the bytes left in the trees"""
+        now = time()
+        released = list(released)
+        candidates = []
+        usage = 0
+        for root, pattern in self.roots.items():
+            if not os.path.isdir(root):
+                continue
+            for folder, _, names in os.walk(root):
+                for name in names:
+                    path = os.path.realpath(os.path.join(folder, name))
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    usage += stat.st_size
+                    if not fnmatch(name, pattern) or self._covered(path, protected):
+                        continue
+                    orphaned = self._covered(path, released)
+                    candidates.append((stat.st_mtime, path, stat.st_size, orphaned))
+
+        reclaimed = files = 0
+        candidates.sort()
+        for mtime, path, size, orphaned in candidates:
+            expired = orphaned or now - mtime > self.ttl
+            over_quota = self.quota_bytes and usage > self.quota_bytes
+            if not expired and not over_quota or self._claimed_now(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            usage -= size
+            reclaimed += size
+            files += 1
+            LOGGER(__name__).info(f"Janitor removed {path} ({size} bytes)")
+
+        for root in self.roots:
+            for folder, _, _ in sorted(os.walk(root), key=lambda entry: -len(entry[0])):
+                real = os.path.realpath(folder)
+                if real == os.path.realpath(root) or self._covered(real, protected):
+                    continue
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    pass
+        return reclaimed, files, usage
+
+    async def sweep(self):
+        released, self._released = self._released, set()
+        reclaimed, files, self.usage = await asyncio.to_thread(self._scan, self._protected(), released)
+        self.reclaimed_bytes += reclaimed
+        self.reclaimed_files += files
+        self.last_sweep = time()
+        if files:
+            LOGGER(__name__).info(f"Janitor reclaimed {reclaimed} bytes in {files} file(s)")
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                LOGGER(__name__).error(f"Janitor sweep failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self, loop):
+        if self._task is None:
+            self._task = loop.create_task(self.run())
+
+    def wake(self):
+        """Sweep now instead of waiting for the next interval (e.g. after /killall)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def status(self) -> str:
+        quota = f"/{self.quota_bytes / 1024**3:.2f}" if self.quota_bytes else ""
+        return (
+            f"{self.usage / 1024**3:.2f}{quota} GB in use, "
+            f"reclaimed {self.reclaimed_bytes / 1024**2:.1f} MiB in {self.reclaimed_files} file(s)"
+        )
+
+
+janitor = Janitor(
+    {**{root.path: "*" for root in storage.roots}, "Assets": "thumb_*.jpg"},
+    ttl=PyroConf.JANITOR_TTL_MIN * 60,
+    quota_bytes=PyroConf.DOWNLOADS_QUOTA_MB * 1024 * 1024,
+    interval=PyroConf.JANITOR_INTERVAL,
+)
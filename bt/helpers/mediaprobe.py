@@ -0,0 +1,248 @@
+# bt/helpers/mediaprobe.py
+# In-process duration/width/height for MP4 and Matroska files, read straight from the headers
+
+import io
+import os
+import struct
+from typing import Optional, Tuple
+from logger import LOGGER
+
+MP4_EXTENSIONS = {".mp4", ".m4v", ".mov", ".3gp"}
+MKV_EXTENSIONS = {".mkv", ".webm"}
+
+# moov is normally well under a megabyte; anything much larger is not worth parsing here
+MAX_MOOV_SIZE = 32 * 1024 * 1024
+
+# Matroska element ids
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEGMENT_INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+
+
+# ---------------------------------------------------------------- MP4 / ISO BMFF
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, body_start, body_end) for the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def find_top_level_box(f, wanted: bytes) -> Optional[Tuple[int, int, int]]:
+    """Return (offset, header_size, size) of the first top-level box of that type, seeking past everything else"""
+    file_size = os.fstat(f.fileno()).st_size
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            return None
+        if kind == wanted:
+            return offset, header_size, size
+        offset += size
+    return None
+
+
+def _mvhd_duration(data: bytes, start: int) -> float:
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return duration / timescale if timescale else 0.0
+
+
+def _tkhd_size(data: bytes, start: int) -> Tuple[int, int]:
+    version = data[start]
+    # matrix and width/height follow the version-dependent times and ids
+    matrix_at = start + (52 if version == 1 else 40)
+    a, b = struct.unpack_from(">ii", data, matrix_at)
+    width, height = struct.unpack_from(">II", data, matrix_at + 36)
+    width, height = width >> 16, height >> 16
+    if a == 0 and abs(b) == 0x10000:  # rotated by 90 or 270 degrees
+        width, height = height, width
+    return width, height
+
+
+def _probe_mp4(f) -> Optional[Tuple[int, int, int]]:
+    found = find_top_level_box(f, b"moov")
+    if not found:
+        return None
+    offset, header_size, size = found
+    if size > MAX_MOOV_SIZE:
+        return None
+    f.seek(offset + header_size)
+    moov = f.read(size - header_size)
+
+    duration, width, height = 0.0, 0, 0
+    for kind, start, end in _iter_boxes(moov):
+        if kind == b"mvhd":
+            duration = _mvhd_duration(moov, start)
+        elif kind == b"trak" and not width:
+            for child, child_start, _ in _iter_boxes(moov, start, end):
+                if child == b"tkhd":
+                    width, height = _tkhd_size(moov, child_start)
+    return round(duration), width, height
+
+
+# ---------------------------------------------------------------- Matroska / WebM
+
+def _read_id(f) -> Optional[int]:
+    first = f.read(1)
+    if not first:
+        return None
+    length = 1
+    mask = 0x80
+    while length <= 4 and not first[0] & mask:
+        mask >>= 1
+        length += 1
+    if length > 4:
+        return None
+    return int.from_bytes(first + f.read(length - 1), "big")
+
+
+def _read_size(f) -> Optional[int]:
+    """Element size; -1 for 'unknown' (live streams)"""
+    first = f.read(1)
+    if not first:
+        return None
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first[0] & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None
+    value = first[0] & (mask - 1)
+    rest = f.read(length - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    if value == (1 << (7 * length)) - 1:
+        return -1
+    return value
+
+
+def _iter_elements(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (id, body_start, body_end) for the elements in an in-memory master element"""
+    end = len(data) if end is None else end
+    stream = io.BytesIO(data)
+    stream.seek(start)
+    while stream.tell() < end:
+        element_id = _read_id(stream)
+        size = _read_size(stream)
+        if element_id is None or size is None or size < 0:
+            return
+        body = stream.tell()
+        yield element_id, body, min(body + size, end)
+        stream.seek(body + size)
+
+
+def _uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], "big")
+
+
+def _float(data: bytes, start: int, end: int) -> float:
+    if end - start == 4:
+        return struct.unpack_from(">f", data, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", data, start)[0]
+    return 0.0
+
+
+def _probe_mkv(f) -> Optional[Tuple[int, int, int]]:
+    if _read_id(f) != EBML_HEADER:
+        return None
+    size = _read_size(f)
+    if size is None or size < 0:
+        return None
+    f.seek(size, os.SEEK_CUR)
+    if _read_id(f) != SEGMENT or _read_size(f) is None:
+        return None
+
+    duration = None
+    width = height = 0
+    timecode_scale = 1_000_000
+    # Info and Tracks come before the first Cluster in practically every muxer's output
+    while duration is None or not width:
+        element_id = _read_id(f)
+        size = _read_size(f)
+        if element_id is None or size is None or size < 0 or element_id == CLUSTER:
+            break
+        if element_id not in (SEGMENT_INFO, TRACKS):
+            f.seek(size, os.SEEK_CUR)
+            continue
+        body = f.read(size)
+        if element_id == SEGMENT_INFO:
+            raw_duration = 0.0
+            for child, start, end in _iter_elements(body):
+                if child == TIMECODE_SCALE:
+                    timecode_scale = _uint(body, start, end)
+                elif child == DURATION:
+                    raw_duration = _float(body, start, end)
+            duration = raw_duration * timecode_scale / 1e9
+        else:
+            for entry, start, end in _iter_elements(body):
+                if entry != TRACK_ENTRY or width:
+                    continue
+                for child, child_start, child_end in _iter_elements(body, start, end):
+                    if child != VIDEO:
+                        continue
+                    for field, field_start, field_end in _iter_elements(body, child_start, child_end):
+                        if field == PIXEL_WIDTH:
+                            width = _uint(body, field_start, field_end)
+                        elif field == PIXEL_HEIGHT:
+                            height = _uint(body, field_start, field_end)
+
+    if duration is None:
+        return None
+    return round(duration), width, height
+
+
+def probe_header(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    (duration, width, height) from the container headers of an MP4/MOV or
+    Matroska/WebM file, without starting ffprobe. Returns None for any other
+    container or when the headers can't be read; callers then use ffprobe.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in MP4_EXTENSIONS and ext not in MKV_EXTENSIONS:
+        return None
+    try:
+        with open(path, "rb") as f:
+            result = _probe_mp4(f) if ext in MP4_EXTENSIONS else _probe_mkv(f)
+    except (OSError, struct.error, IndexError, ValueError) as e:
+        LOGGER(__name__).info(f"Header probe failed for {path}: {e}")
+        return None
+    if not result or not result[0]:
+        return None
+    return result
@@ -1,5 +1,6 @@
 # Copyright (C) @TheSmartBisnu
 # Channel: https://t.me/itsSmartDev
+from typing import Optional
 from pyrogram.parser import Parser
 from pyrogram.utils import get_channel_id
 
@@ -97,4 +98,25 @@ def get_file_name(message_id: int, chat_message) -> str:
     elif chat_message.photo:
         return f"{message_id}.jpg"
     else:
-        return f"{message_id}"
\ No newline at end of file
+        return f"{message_id}"
+
+
+# Media kinds that carry a file; web pages, polls, locations, contacts and dice have no size
+FILE_MEDIA = ("document", "video", "audio", "animation", "photo", "voice", "video_note", "sticker")
+
+
+def has_file(msg) -> bool:
+    return bool(msg.media) and msg.media.value in FILE_MEDIA
+
+
+def media_size(messages) -> Optional[int]:
+    """Total file size of the messages' media; None if any file's size is unknown"""
+    total = 0
+    for msg in messages:
+        if not has_file(msg):
+            continue
+        size = getattr(getattr(msg, msg.media.value, None), "file_size", None)
+        if not size:
+            return None
+        total += size
+    return total
@@ -0,0 +1,172 @@
+# bt/helpers/peers.py
+# Persistent username/id -> (id, access_hash) cache, one file per user account
+
+import os
+import json
+from time import time
+from typing import Optional, Tuple
+from pyrogram.utils import get_channel_id
+from logger import LOGGER
+from config import PyroConf
+
+
+class PeerCache:
+    """
+    The user client runs from a session string, so its peer storage starts
+    empty on every restart and the first username link or cold channel id
+    of a job costs a ResolveUsername/GetChannels call (or fails with
+    PeerIdInvalid). Every peer resolved once is kept here, in Pyrogram's own
+    id convention (-100... for channels), and saved to disk. At startup the
+    most recently used peers are written into the Pyrogram client's storage;
+    Telethon builds an InputPeer from its own cache instead of calling
+    get_entity. Access hashes are only valid for the account that resolved
+    them, so each account has its own file, stamped with the account's user
+    id (bind) and emptied if a different account logs in with it.
+    """
+
+    def __init__(self, path: str, max_entries: int, warm_count: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.warm_count = warm_count
+        self._peers = {}  # peer id -> {"access_hash", "type", "username", "used"}
+        self._usernames = {}  # lowercase username -> peer id
+        self.account = None  # user id of the account these hashes belong to
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.account = data.get("account")
+        for peer_id, entry in data.get("peers", {}).items():
+            self._peers[int(peer_id)] = entry
+            if entry.get("username"):
+                self._usernames[entry["username"]] = int(peer_id)
+        LOGGER(__name__).info(f"Peer cache: {len(self._peers)} peer(s) loaded from {self.path}")
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"account": self.account, "peers": {str(k): v for k, v in self._peers.items()}}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            LOGGER(__name__).warning(f"Could not save peer cache: {e}")
+
+    @staticmethod
+    def _key(chat_id):
+        """Peer id for numeric chat ids, lowercase username (no @ or t.me/) otherwise"""
+        if isinstance(chat_id, int):
+            return chat_id
+        text = str(chat_id).strip().lower().replace("https://t.me/", "").lstrip("@")
+        return int(text) if text.lstrip("-").isdigit() else text
+
+    def _find(self, chat_id) -> Optional[int]:
+        key = self._key(chat_id)
+        peer_id = self._usernames.get(key) if isinstance(key, str) else key
+        return peer_id if peer_id in self._peers else None
+
+    def remember(self, chat_id, input_peer, username: str = None):
+        """Store a raw InputPeer (Pyrogram or Telethon, they share the field names)"""
+        if hasattr(input_peer, "channel_id"):
+            peer_id, peer_type = get_channel_id(input_peer.channel_id), "channel"
+        elif hasattr(input_peer, "user_id"):
+            peer_id, peer_type = input_peer.user_id, "user"
+        elif hasattr(input_peer, "chat_id"):
+            peer_id, peer_type = -input_peer.chat_id, "group"
+        else:
+            return
+        key = self._key(chat_id)
+        username = username or (key if isinstance(key, str) else None)
+        self._peers[peer_id] = {
+            "access_hash": getattr(input_peer, "access_hash", 0) or 0,
+            "type": peer_type,
+            "username": username,
+            "used": time(),
+        }
+        if username:
+            self._usernames[username] = peer_id
+        if len(self._peers) > self.max_entries:
+            oldest = min(self._peers, key=lambda p: self._peers[p]["used"])
+            self._usernames.pop(self._peers.pop(oldest).get("username"), None)
+        self.save()
+
+    def bind(self, account_id: int):
+        """Tie the cache to the logged-in account, dropping hashes left by another one"""
+        if self.account == account_id:
+            return
+        if self.account is not None and self._peers:
+            LOGGER(__name__).warning(
+                f"Peer cache {self.path} belonged to account {self.account}, not {account_id}; clearing it"
+            )
+            self._peers.clear()
+            self._usernames.clear()
+        self.account = account_id
+        self.save()
+
+    def forget(self, chat_id) -> bool:
+        """Drop a cached peer whose access hash was rejected; True if there was one"""
+        peer_id = self._find(chat_id)
+        if peer_id is None:
+            return False
+        self._usernames.pop(self._peers.pop(peer_id).get("username"), None)
+        self.save()
+        LOGGER(__name__).info(f"Peer cache: dropped {chat_id} after the server rejected it")
+        return True
+
+    def _storage_row(self, peer_id: int) -> tuple:
+        entry = self._peers[peer_id]
+        return peer_id, entry["access_hash"], entry["type"], entry.get("username"), None
+
+    async def resolve(self, client, chat_id):
+        """
+        Make sure client can address chat_id without a network round-trip next
+        time; returns chat_id unchanged so it can be used inline.
+        """
+        peer_id = self._find(chat_id)
+        if peer_id is not None:
+            self.hits += 1
+            self._peers[peer_id]["used"] = time()
+            await client.storage.update_peers([self._storage_row(peer_id)])
+            return chat_id
+        self.misses += 1
+        self.remember(chat_id, await client.resolve_peer(chat_id))
+        return chat_id
+
+    def input_ids(self, chat_id) -> Optional[Tuple[str, int, int]]:
+        """(type, raw id, access_hash) for building a Telethon InputPeer, or None if not cached"""
+        peer_id = self._find(chat_id)
+        if peer_id is None:
+            return None
+        self.hits += 1
+        entry = self._peers[peer_id]
+        entry["used"] = time()
+        raw_id = get_channel_id(peer_id) if entry["type"] == "channel" else abs(peer_id)
+        return entry["type"], raw_id, entry["access_hash"]
+
+    async def prewarm(self, client):
+        """Load the most recently used peers into client's (in-memory) storage"""
+        self.bind(client.me.id)
+        recent = sorted(self._peers, key=lambda p: self._peers[p]["used"], reverse=True)[:self.warm_count]
+        if recent:
+            await client.storage.update_peers([self._storage_row(peer_id) for peer_id in recent])
+            LOGGER(__name__).info(f"Peer cache: prewarmed {len(recent)} peer(s)")
+
+    def status(self) -> str:
+        return f"{len(self._peers)} peer(s), {self.hits} hit(s), {self.misses} miss(es)"
+
+
+def peer_cache_path(suffix) -> str:
+    """PEER_CACHE_PATH with a suffix, for accounts other than the main user session"""
+    root, ext = os.path.splitext(PyroConf.PEER_CACHE_PATH)
+    return f"{root}-{suffix}{ext}"
+
+
+peer_cache = PeerCache(PyroConf.PEER_CACHE_PATH, PyroConf.PEER_CACHE_SIZE, PyroConf.PEER_CACHE_WARM)
@@ -0,0 +1,67 @@
+# bt/helpers/relay.py
+# Premium upload path: the user session uploads files up to 4 GB, the bot re-sends them by file_id
+
+import os
+from io import BytesIO
+from logger import LOGGER
+from config import PyroConf
+
+# Telegram's per-file upload limits (bots and regular accounts / premium accounts)
+BOT_UPLOAD_LIMIT = 2097152000
+PREMIUM_UPLOAD_LIMIT = 2 * BOT_UPLOAD_LIMIT
+
+
+class UploadRelay:
+    """
+    Bots can't upload more than 2 GB, but a premium user session can upload 4 GB
+    and the bot may then send the stored file by file_id. Files between the two
+    limits are uploaded by the user client into RELAY_CHAT_ID (a chat both
+    accounts are members of) and delivered by the bot as cached media.
+    """
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.user = None
+
+    def attach(self, user):
+        self.user = user
+
+    @property
+    def enabled(self) -> bool:
+        me = getattr(self.user, "me", None)
+        return bool(self.chat_id and me and me.is_premium)
+
+    def upload_limit(self) -> int:
+        """Largest file that can be delivered whole (anything bigger gets split)"""
+        return PREMIUM_UPLOAD_LIMIT if self.enabled else BOT_UPLOAD_LIMIT
+
+    def needed(self, file_size: int) -> bool:
+        return self.enabled and BOT_UPLOAD_LIMIT < file_size <= PREMIUM_UPLOAD_LIMIT
+
+    async def send(self, bot, chat_id, path: str, media_type: str, caption: str = "", **kwargs):
+        """Upload path with the user session, then send it from the bot; returns the bot's Message"""
+        send = {
+            "video": self.user.send_video,
+            "audio": self.user.send_audio,
+        }.get(media_type, self.user.send_document)
+        LOGGER(__name__).info(f"Relaying {path} ({media_type}) through chat {self.chat_id}")
+        relayed = await send(self.chat_id, path, caption=caption, **kwargs)
+
+        # The user's file_id is not valid for the bot; read the bot's own view of the message
+        bot_copy = await bot.get_messages(self.chat_id, relayed.id)
+        media = getattr(bot_copy, bot_copy.media.value)
+        return await bot.send_cached_media(chat_id, media.file_id, caption=caption)
+
+
+upload_relay = UploadRelay(PyroConf.RELAY_CHAT_ID)
+
+
+async def reply_file(message, media_type: str, path: str, **kwargs):
+    """
+    message.reply_<media_type>(path, ...), going through the relay when the file
+    is too big for the bot. path may also be a BytesIO (in-memory downloads are
+    always small enough for the bot).
+    """
+    if not isinstance(path, BytesIO) and upload_relay.needed(os.path.getsize(path)):
+        return await upload_relay.send(message._client, message.chat.id, path, media_type, **kwargs)
+    return await getattr(message, f"reply_{media_type}")(path, **kwargs)
@@ -0,0 +1,209 @@
+# bt/helpers/scheduler.py
+# Per-user fair-share job queue (self-clocked weighted fair queuing)
+
+import asyncio
+import itertools
+from typing import Optional
+from heapq import heappush, heappop, heapify
+from contextlib import asynccontextmanager
+from logger import LOGGER
+from config import PyroConf
+
+
+class Ticket:
+    def __init__(self, user_id, start: float, finish: float, seq: int, on_position=None):
+        self.user_id = user_id
+        self.start = start
+        self.finish = finish
+        self.seq = seq
+        self.on_position = on_position
+        self.position = None
+        self.granted = asyncio.get_running_loop().create_future()
+        self.released = False
+
+    def __lt__(self, other):
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class FairScheduler:
+    """
+    Admits at most `workers` jobs at a time. Waiting jobs are ordered by a
+    virtual finish tag: start = max(virtual time, user's previous finish),
+    finish = start + cost / weight. A user with many queued jobs therefore
+    keeps pushing their own tags back, while a newcomer starts at the
+    current virtual time and is served next.
+    """
+
+    def __init__(self, workers: int, weights: dict = None):
+        self.workers = max(1, workers)
+        self.weights = weights or {}
+        self.running = 0
+        self.virtual_time = 0.0
+        self._last_finish = {}
+        self._pending = []
+        self._seq = itertools.count()
+        self._notices = set()
+
+    def _waiting(self):
+        return sorted(t for t in self._pending if not t.granted.done())
+
+    def _dispatch(self):
+        while self.running < self.workers and self._pending:
+            ticket = heappop(self._pending)
+            if ticket.granted.done():  # cancelled while waiting
+                continue
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, ticket.finish)
+            ticket.granted.set_result(True)
+            self._notify(ticket, 0)
+        for position, ticket in enumerate(self._waiting(), 1):
+            self._notify(ticket, position)
+        if not self._pending and not self.running:
+            # Idle: start a new busy period so old finish tags don't penalise anyone
+            self.virtual_time = 0.0
+            self._last_finish.clear()
+
+    def _notify(self, ticket: Ticket, position: int):
+        if ticket.on_position is None or ticket.position == position:
+            return
+        if ticket.position is None and position == 0:  # admitted without waiting
+            return
+        ticket.position = position
+        task = asyncio.create_task(ticket.on_position(position))
+        self._notices.add(task)
+        task.add_done_callback(self._notices.discard)
+
+    async def acquire(self, user_id, cost: float = 1.0, on_position=None) -> Ticket:
+        weight = self.weights.get(user_id, 1.0)
+        start = max(self.virtual_time, self._last_finish.get(user_id, 0.0))
+        ticket = Ticket(user_id, start, start + cost / weight, next(self._seq), on_position)
+        self._last_finish[user_id] = ticket.finish
+        heappush(self._pending, ticket)
+        self._dispatch()
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                self.release(ticket)
+            else:
+                ticket.granted.cancel()
+                self._withdraw(ticket)
+                self._notify(ticket, 0)
+                self._dispatch()
+            raise
+        return ticket
+
+    def _withdraw(self, ticket: Ticket):
+        """Give back the virtual time of a ticket cancelled before it was served"""
+        span = ticket.finish - ticket.start
+        if ticket.user_id not in self._last_finish:  # a new busy period already reset the tags
+            return
+        for other in self._pending:
+            if other.user_id == ticket.user_id and other.seq > ticket.seq and not other.granted.done():
+                other.start -= span
+                other.finish -= span
+        heapify(self._pending)
+        self._last_finish[ticket.user_id] -= span
+
+    def release(self, ticket: Ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id, cost: float = 1.0, on_position=None):
+        ticket = await self.acquire(user_id, cost, on_position)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def position(self, user_id) -> int:
+        """Queue position of the user's first waiting job (0 if none is waiting)"""
+        for position, ticket in enumerate(self._waiting(), 1):
+            if ticket.user_id == user_id:
+                return position
+        return 0
+
+    def status(self) -> str:
+        waiting = self._waiting()
+        users = len({t.user_id for t in waiting})
+        return f"{self.running}/{self.workers} running, {len(waiting)} queued ({users} user(s))"
+
+
+class JobLanes:
+    """
+    Separate fair queues per lane, each with its own concurrency, so short
+    jobs (text, photos, small files) never wait behind large videos and splits.
+    """
+
+    def __init__(self, **lanes: FairScheduler):
+        self.lanes = lanes
+
+    async def acquire(self, user_id, lane: str = "fast", cost: float = 1.0, on_position=None) -> Ticket:
+        ticket = await self.lanes[lane].acquire(user_id, cost, on_position)
+        ticket.lane = lane
+        return ticket
+
+    def release(self, ticket: Ticket):
+        self.lanes[ticket.lane].release(ticket)
+
+    def status(self) -> str:
+        return " | ".join(f"{name}: {lane.status()}" for name, lane in self.lanes.items())
+
+
+def pick_lane(file_size: Optional[int] = 0) -> str:
+    """
+    Heavy lane for anything big enough to take minutes (large videos, files
+    that get split). file_size None means unknown, which is assumed to be
+    DISK_UNKNOWN_SIZE_MB like the disk budget does.
+    """
+    if file_size is None:
+        file_size = PyroConf.DISK_UNKNOWN_SIZE_MB * 1024 * 1024
+    if file_size > PyroConf.HEAVY_LANE_MIN_MB * 1024 * 1024:
+        return "heavy"
+    return "fast"
+
+
+def queue_notice(message):
+    """on_position callback that keeps a 'queued at position N' reply up to date"""
+    notice = None
+    lock = asyncio.Lock()
+
+    async def update(position: int):
+        nonlocal notice
+        async with lock:
+            try:
+                if position and notice is None:
+                    notice = await message.reply(f"**⏳ Queued — position {position}**")
+                elif position:
+                    await notice.edit(f"**⏳ Queued — position {position}**")
+                elif notice is not None:
+                    await notice.delete()
+                    notice = None
+            except Exception as e:
+                LOGGER(__name__).warning(f"Could not update queue notice: {e}")
+
+    return update
+
+
+def requester_id(message) -> int:
+    return message.from_user.id if message.from_user else message.chat.id
+
+
+def _parse_weights(raw: str) -> dict:
+    weights = {}
+    for item in raw.split(","):
+        if ":" in item:
+            uid, weight = item.split(":", 1)
+            weights[int(uid)] = float(weight)
+    return weights
+
+
+_weights = _parse_weights(PyroConf.USER_WEIGHTS)
+job_scheduler = JobLanes(
+    fast=FairScheduler(PyroConf.FAST_LANE_WORKERS, _weights),
+    heavy=FairScheduler(PyroConf.HEAVY_LANE_WORKERS, _weights),
+)
@@ -0,0 +1,145 @@
+# bt/helpers/sessions.py
+# Pool of user sessions for reading source chats, balanced by FloodWait history and bytes in flight
+
+from time import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pyrogram.errors import (
+    FloodWait,
+    PeerIdInvalid,
+    ChannelInvalid,
+    ChannelPrivate,
+    UsernameInvalid,
+    UsernameNotOccupied,
+)
+from logger import LOGGER
+from config import PyroConf
+from helpers.peers import PeerCache, peer_cache, peer_cache_path
+
+# The session can't see this chat (not a member, banned, unknown to this account): try another one
+NO_ACCESS_ERRORS = (PeerIdInvalid, ChannelInvalid, ChannelPrivate, UsernameInvalid, UsernameNotOccupied)
+# ... or its cached access hash was rejected, which also means the cache entry must go
+STALE_PEER_ERRORS = (PeerIdInvalid, ChannelInvalid)
+
+
+class UserSession:
+    def __init__(self, index: int, client, peers: PeerCache):
+        self.index = index
+        self.client = client
+        self.peers = peers  # access hashes are per account, so each session has its own cache
+        self.flood_until = 0.0
+        self.floods = deque()  # times of recent FloodWaits
+        self.in_flight = 0  # bytes of running jobs assigned to this session
+        self.jobs = 0
+        self.no_access = set()  # chats this account could not read
+
+    def recent_floods(self, now: float) -> int:
+        while self.floods and now - self.floods[0] > PyroConf.SESSION_FLOOD_WINDOW:
+            self.floods.popleft()
+        return len(self.floods)
+
+    def record_flood(self, seconds: int):
+        now = time()
+        self.floods.append(now)
+        self.flood_until = max(self.flood_until, now + seconds)
+        LOGGER(__name__).warning(f"User session {self.index} hit FloodWait {seconds}s")
+
+
+class SessionPool:
+    """
+    Assigns each job to one of the configured user sessions. Sessions that
+    are known not to see the chat are skipped; the rest are ordered by
+    whether they are waiting out a FloodWait, how many FloodWaits they hit in
+    the last SESSION_FLOOD_WINDOW seconds, then bytes currently in flight.
+    Reads fail over to the next session on FloodWait or missing access.
+    Messages fetched through a session stay bound to its client, so the
+    media download runs on the same account.
+    """
+
+    def __init__(self, clients: list):
+        self.sessions = [
+            UserSession(i, client, peer_cache if i == 0 else PeerCache(
+                peer_cache_path(i), PyroConf.PEER_CACHE_SIZE, PyroConf.PEER_CACHE_WARM
+            ))
+            for i, client in enumerate(clients)
+        ]
+        self.failovers = 0
+
+    @property
+    def primary(self):
+        return self.sessions[0].client
+
+    @property
+    def clients(self) -> list:
+        return [session.client for session in self.sessions]
+
+    def session_for(self, client) -> UserSession:
+        return next((s for s in self.sessions if s.client is client), self.sessions[0])
+
+    def client_for(self, chat_message):
+        """Client a fetched message is bound to (the session that read it)"""
+        return getattr(chat_message, "_client", None) or self.primary
+
+    def candidates(self, chat_id) -> list:
+        now = time()
+        usable = [s for s in self.sessions if chat_id not in s.no_access] or list(self.sessions)
+        return sorted(usable, key=lambda s: (s.flood_until > now, s.recent_floods(now), s.in_flight, s.jobs))
+
+    async def read(self, chat_id, fetch):
+        """
+        Run fetch(client) on the best session for chat_id, moving on to the
+        next one on FloodWait or missing access. Returns (client, result).
+        """
+        last_error = None
+        for attempt, session in enumerate(self.candidates(chat_id)):
+            if attempt:
+                self.failovers += 1
+            try:
+                await session.peers.resolve(session.client, chat_id)
+                result = await fetch(session.client)
+            except FloodWait as e:
+                session.record_flood(e.value)
+                last_error = e
+                continue
+            except NO_ACCESS_ERRORS as e:
+                LOGGER(__name__).info(f"User session {session.index} can't read {chat_id}: {e}")
+                if isinstance(e, STALE_PEER_ERRORS):
+                    session.peers.forget(chat_id)
+                session.no_access.add(chat_id)
+                last_error = e
+                continue
+            session.no_access.discard(chat_id)
+            return session.client, result
+        raise last_error
+
+    @asynccontextmanager
+    async def busy(self, client, nbytes: int = 0):
+        """Count a running job (and its size) against the session that serves it"""
+        session = self.session_for(client)
+        session.in_flight += nbytes
+        session.jobs += 1
+        try:
+            yield session
+        except FloodWait as e:
+            session.record_flood(e.value)
+            raise
+        finally:
+            session.in_flight -= nbytes
+            session.jobs -= 1
+
+    async def start(self):
+        for session in self.sessions:
+            await session.client.start()
+            await session.peers.prewarm(session.client)
+
+    async def stop(self):
+        for session in self.sessions:
+            await session.client.stop()
+
+    def status(self) -> str:
+        now = time()
+        parts = []
+        for s in self.sessions:
+            flood = f", flood {int(s.flood_until - now)}s" if s.flood_until > now else ""
+            parts.append(f"#{s.index}: {s.jobs} job(s), {s.in_flight / 1024**2:.0f} MiB{flood}")
+        return "; ".join(parts) + f"; {self.failovers} failover(s)"
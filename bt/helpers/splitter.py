@@ -0,0 +1,162 @@
+# bt/helpers/splitter.py
+# Split a byte stream into plain part files while it downloads
+
+import os
+import json
+import asyncio
+import hashlib
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from logger import LOGGER
+from helpers.files import get_readable_file_size
+
+# Finished parts allowed to wait for upload before the download is throttled
+MAX_PENDING_PARTS = 2
+# Parts on disk at most: one uploading, MAX_PENDING_PARTS queued and one being written
+PARTS_ON_DISK = MAX_PENDING_PARTS + 2
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StreamSplitter:
+    """
+    Cuts an incoming byte stream into fixed-size files <name>.001, <name>.002, ...
+    that `cat <name>.0* > <name>` rejoins. Every finished part goes on `ready`
+    as (index, path) so it can be uploaded while later parts are still downloading.
+    """
+
+    def __init__(self, base_path: str, part_size: int, max_pending: int = MAX_PENDING_PARTS):
+        self.base_path = base_path
+        self.part_size = part_size
+        self.ready = asyncio.Queue(maxsize=max_pending)
+        self.parts = []
+        self.total_size = 0
+        self._sha256 = hashlib.sha256()
+        self._file = None
+        self._part_sha256 = None
+        self._part_written = 0
+
+    def _part_path(self, index: int) -> str:
+        return f"{self.base_path}.{index:03d}"
+
+    def _open_part(self):
+        self._file = open(self._part_path(len(self.parts) + 1), "wb")
+        self._part_sha256 = hashlib.sha256()
+        self._part_written = 0
+
+    async def _close_part(self):
+        self._file.close()
+        index = len(self.parts) + 1
+        path = self._part_path(index)
+        self.parts.append({
+            "name": os.path.basename(path),
+            "size": self._part_written,
+            "sha256": self._part_sha256.hexdigest(),
+        })
+        self._file = None
+        LOGGER(__name__).info(f"Part {index} ready: {path} ({get_readable_file_size(self._part_written)})")
+        # Blocks while too many finished parts wait for upload, which throttles the download
+        await self.ready.put((index, path))
+
+    async def write(self, data: bytes):
+        self._sha256.update(data)
+        self.total_size += len(data)
+        view = memoryview(data)
+        while view:
+            if self._file is None:
+                self._open_part()
+            room = self.part_size - self._part_written
+            chunk = view[:room]
+            self._file.write(chunk)
+            self._part_sha256.update(chunk)
+            self._part_written += len(chunk)
+            view = view[len(chunk):]
+            if self._part_written >= self.part_size:
+                await self._close_part()
+
+    async def close(self) -> str:
+        """Finish the last part, write the manifest and signal the end of the stream"""
+        if self._file is not None:
+            await self._close_part()
+        manifest_path = f"{self.base_path}-manifest.json"
+        name = os.path.basename(self.base_path)
+        with open(manifest_path, "w") as f:
+            json.dump({
+                "name": name,
+                "size": self.total_size,
+                "sha256": self._sha256.hexdigest(),
+                "part_size": self.part_size,
+                "parts": self.parts,
+                "join": f"cat {name}.0* > {name}",
+            }, f, indent=2)
+        await self.ready.put(None)
+        return manifest_path
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for index in range(1, len(self.parts) + 2):
+            _remove(self._part_path(index))
+
+
+async def split_stream(
+    chunks: AsyncIterator[bytes],
+    base_path: str,
+    part_size: int,
+    upload_part: Callable[[int, str], Awaitable[None]],
+) -> Optional[str]:
+    """
+    Write `chunks` into parts of `part_size` bytes and call upload_part(index, path)
+    for each one as soon as it is complete; uploaded parts are deleted right away.
+    Returns the manifest path (the caller uploads and cleans it up).
+    """
+    splitter = StreamSplitter(base_path, part_size)
+
+    async def produce():
+        try:
+            async for data in chunks:
+                await splitter.write(data)
+            return await splitter.close()
+        except BaseException:
+            await splitter.ready.put(None)
+            raise
+
+    async def consume():
+        while True:
+            item = await splitter.ready.get()
+            if item is None:
+                return
+            index, path = item
+            try:
+                await upload_part(index, path)
+            finally:
+                # Plain remove: cleanup_download would drop the folder the next part is about to be written to
+                _remove(path)
+
+    producer = asyncio.create_task(produce())
+    try:
+        await consume()
+        return await producer
+    except BaseException:
+        producer.cancel()
+        splitter.abort()
+        raise
+
+
+def part_count(file_size: int, part_size: int) -> int:
+    return max(1, -(-file_size // part_size))
+
+
+async def read_chunks(path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """Feed an already downloaded file through split_stream"""
+    with open(path, "rb") as f:
+        while True:
+            data = await asyncio.to_thread(f.read, chunk_size)
+            if not data:
+                return
+            yield data
@@ -0,0 +1,68 @@
+# bt/helpers/storage.py
+# Several download roots (e.g. a fast scratch disk and a big array), chosen per file
+
+import os
+import random
+from typing import List
+from logger import LOGGER
+from config import PyroConf
+from helpers.disk import disk_budget, estimate_footprint
+
+
+class StorageRoot:
+    def __init__(self, path: str, weight: float = 1.0, reserve_bytes: int = 0):
+        self.path = path
+        self.weight = weight
+        self.reserve_bytes = reserve_bytes
+
+
+class StoragePool:
+    """
+    Places each download on one of the configured roots. Only roots with room
+    for the file's expected footprint (after their reserve and what running
+    jobs have already claimed) are candidates; among those, a root is picked
+    with probability proportional to its weight. If none has room right now,
+    the root with the most space is used and the disk budget makes the job wait.
+    """
+
+    def __init__(self, roots: List[StorageRoot]):
+        self.roots = roots
+        for root in roots:
+            os.makedirs(root.path, exist_ok=True)
+            disk_budget.set_reserve(root.path, root.reserve_bytes)
+
+    def available(self, root: StorageRoot) -> int:
+        return disk_budget.available(os.path.join(root.path, "_"))
+
+    def pick(self, expected_size: int = 0) -> str:
+        if len(self.roots) == 1:
+            return self.roots[0].path
+        need = estimate_footprint(expected_size or PyroConf.DISK_UNKNOWN_SIZE_MB * 1024 * 1024)
+        space = {root.path: self.available(root) for root in self.roots}
+        fits = [root for root in self.roots if space[root.path] >= need and root.weight > 0]
+        if fits:
+            return random.choices(fits, weights=[root.weight for root in fits])[0].path
+        fallback = max(self.roots, key=lambda root: space[root.path])
+        LOGGER(__name__).info(f"No storage root has {need} bytes free now; using {fallback.path}")
+        return fallback.path
+
+    def status(self) -> str:
+        return ", ".join(
+            f"{root.path} {max(0, self.available(root)) / 1024**3:.1f} GB free" for root in self.roots
+        )
+
+
+def parse_roots(raw: str) -> List[StorageRoot]:
+    """'path[:weight[:reserve_mb]],...' as in STORAGE_ROOTS"""
+    roots = []
+    for item in raw.split(","):
+        fields = item.strip().split(":")
+        if not fields[0]:
+            continue
+        weight = float(fields[1]) if len(fields) > 1 and fields[1] else 1.0
+        reserve_mb = int(fields[2]) if len(fields) > 2 and fields[2] else 0
+        roots.append(StorageRoot(fields[0], weight, reserve_mb * 1024 * 1024))
+    return roots or [StorageRoot("downloads")]
+
+
+storage = StoragePool(parse_roots(PyroConf.STORAGE_ROOTS))
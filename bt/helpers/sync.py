@@ -0,0 +1,145 @@
+# bt/helpers/sync.py
+# /sync: per-(chat, topic) watermarks of the last delivered post, plus scheduled re-runs
+
+import os
+import json
+import fcntl
+import asyncio
+from contextlib import contextmanager
+from time import time
+from typing import Optional
+from logger import LOGGER
+from config import PyroConf
+
+
+class SyncStore:
+    """
+    One entry per (chat, topic): the highest message id delivered so far,
+    the link prefix used to build post URLs, and an optional schedule.
+    Every change re-reads the state file while holding an exclusive lock on
+    a sibling .lock file, so worker processes that share it
+    (helpers/workers.py) never overwrite each other's watermarks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._runner = None
+        self._task = None
+
+    @staticmethod
+    def key(chat_id, thread_id) -> str:
+        return f"{str(chat_id).lower()}:{thread_id or 0}"
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Hold the state file's lock for one read-modify-write"""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, entries: dict):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, chat_id, thread_id) -> Optional[dict]:
+        return self._read().get(self.key(chat_id, thread_id))
+
+    def entries(self) -> dict:
+        return self._read()
+
+    def ensure(self, chat_id, thread_id, prefix: str, first_id: int, requester: int) -> dict:
+        """Existing entry, or a new one whose first run starts at first_id"""
+        with self._locked():
+            entries = self._read()
+            key = self.key(chat_id, thread_id)
+            if key not in entries:
+                entries[key] = {
+                    "chat_id": chat_id,
+                    "thread_id": thread_id,
+                    "prefix": prefix,
+                    "last_id": first_id - 1,
+                    "requester": requester,
+                    "every": 0,
+                    "last_run": 0,
+                }
+                self._write(entries)
+            return entries[key]
+
+    def update(self, chat_id, thread_id, **fields):
+        with self._locked():
+            entries = self._read()
+            entry = entries.get(self.key(chat_id, thread_id))
+            if entry is None:
+                return
+            entry.update(fields)
+            self._write(entries)
+
+    def advance(self, chat_id, thread_id, last_id: int):
+        """Move the watermark forward (never back)"""
+        with self._locked():
+            entries = self._read()
+            entry = entries.get(self.key(chat_id, thread_id))
+            if entry is not None and last_id > entry["last_id"]:
+                entry["last_id"] = last_id
+                self._write(entries)
+
+    def remove(self, chat_id, thread_id) -> bool:
+        with self._locked():
+            entries = self._read()
+            if entries.pop(self.key(chat_id, thread_id), None) is None:
+                return False
+            self._write(entries)
+            return True
+
+    def due(self) -> list:
+        now = time()
+        return [e for e in self._read().values() if e["every"] and now - e["last_run"] >= e["every"]]
+
+    async def run_scheduled(self):
+        while True:
+            for entry in self.due():
+                try:
+                    await self._runner(entry)
+                except asyncio.CancelledError:
+                    # /killall cancels the sync job itself; only stop when this loop is being cancelled
+                    if asyncio.current_task().cancelling():
+                        raise
+                    LOGGER(__name__).info(f"Scheduled sync of {entry['prefix']} was canceled")
+                except Exception as e:
+                    LOGGER(__name__).error(f"Scheduled sync of {entry['prefix']} failed: {e}")
+                self.update(entry["chat_id"], entry["thread_id"], last_run=time())
+            await asyncio.sleep(PyroConf.SYNC_CHECK_INTERVAL)
+
+    def start(self, loop, runner):
+        """runner(entry) performs one sync; scheduled entries are checked every SYNC_CHECK_INTERVAL"""
+        self._runner = runner
+        if self._task is None:
+            self._task = loop.create_task(self.run_scheduled())
+
+
+async def latest_message_id(client, chat_id) -> int:
+    """Id of the newest message in the chat (one history request)"""
+    async for msg in client.get_chat_history(chat_id, limit=1):
+        return msg.id
+    return 0
+
+
+sync_store = SyncStore(PyroConf.SYNC_STATE_PATH)
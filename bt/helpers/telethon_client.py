@@ -2,55 +2,173 @@
 # Add this new file to handle Telethon operations
 
 import asyncio
+import random
+from time import time, monotonic
 from telethon import TelegramClient
+from telethon.tl.functions import PingRequest
 from telethon.sessions import StringSession
-from telethon.errors import FloodWaitError, AuthKeyError, PhoneCodeInvalidError, RPCError
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+from telethon.utils import get_input_peer
+from telethon.errors import (
+    FloodWaitError,
+    AuthKeyError,
+    PhoneCodeInvalidError,
+    RPCError,
+    ChannelInvalidError,
+    PeerIdInvalidError,
+)
 from config import PyroConf
 from logger import LOGGER
+from helpers.peers import PeerCache, peer_cache_path
 
 class TelethonHandler:
+    """
+    Keeps one Telethon connection open for the life of the bot: started at
+    boot next to the Pyrogram clients, pinged every TELETHON_PING_INTERVAL
+    seconds, and reconnected with exponential backoff (plus jitter) when a
+    ping fails or the connection drops, so topic queries find it ready.
+    """
+    
     def __init__(self):
         self.client = None
         self.session_string = getattr(PyroConf, 'TELETHON_SESSION', None)
+        self.state = "stopped"
+        self.latency_ms = None
+        self.last_ping = 0.0
+        self.reconnects = 0
+        self._connect_lock = asyncio.Lock()
+        self._connected = asyncio.Event()
+        self._keepalive_task = None
+        # TELETHON_SESSION may be a different account from SESSION_STRING, so its hashes live apart
+        self.peers = PeerCache(peer_cache_path("telethon"), PyroConf.PEER_CACHE_SIZE, PyroConf.PEER_CACHE_WARM)
     
     async def create_client(self):
         """Create Telethon client"""
         if self.session_string:
             try:
                 LOGGER(__name__).info("Connecting with Telethon session string...")
-                self.client = TelegramClient(
-                    StringSession(self.session_string), 
-                    PyroConf.API_ID, 
-                    PyroConf.API_HASH
-                )
+                if self.client is None:
+                    self.client = TelegramClient(
+                        StringSession(self.session_string), 
+                        PyroConf.API_ID, 
+                        PyroConf.API_HASH
+                    )
                 await self.client.connect()
                 
                 if await self.client.is_user_authorized():
+                    self.peers.bind((await self.client.get_me()).id)
                     LOGGER(__name__).info("Successfully connected with Telethon!")
+                    self.state = "connected"
+                    self._connected.set()
                     return True
                 else:
                     LOGGER(__name__).error("Telethon session string is invalid or expired")
+                    self.state = "unauthorized"
                     await self.client.disconnect()
                     return False
             except Exception as e:
                 LOGGER(__name__).error(f"Telethon connection failed: {e}")
+                self.state = "disconnected"
                 return False
         else:
             LOGGER(__name__).error("No TELETHON_SESSION found in config")
+            self.state = "disabled"
+            return False
+    
+    async def start(self):
+        """Connect at boot and keep the connection healthy in the background"""
+        if not self.session_string:
+            self.state = "disabled"
+            return
+        await self.create_client()
+        if self._keepalive_task is None and self.state != "unauthorized":
+            self._keepalive_task = asyncio.get_running_loop().create_task(self._keepalive())
+    
+    async def ping(self) -> bool:
+        started = monotonic()
+        try:
+            await asyncio.wait_for(
+                self.client(PingRequest(ping_id=random.getrandbits(63))),
+                timeout=PyroConf.TELETHON_PING_TIMEOUT,
+            )
+        except Exception as e:
+            LOGGER(__name__).warning(f"Telethon ping failed: {e}")
+            return False
+        self.latency_ms = (monotonic() - started) * 1000
+        self.last_ping = time()
+        return True
+    
+    async def reconnect(self):
+        """Reconnect with exponential backoff until it works (or the session turns out to be invalid)"""
+        async with self._connect_lock:
+            if self.state == "connected" and self.client.is_connected():
+                return
+            self._connected.clear()
+            delay = 1.0
+            while True:
+                self.state = "reconnecting"
+                try:
+                    await self.client.disconnect()
+                except Exception:
+                    pass
+                if await self.create_client():
+                    self.reconnects += 1
+                    return
+                if self.state == "unauthorized":
+                    return
+                wait = delay + random.uniform(0, delay / 2)
+                LOGGER(__name__).info(f"Telethon reconnect in {wait:.1f}s")
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, PyroConf.TELETHON_MAX_BACKOFF)
+    
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(PyroConf.TELETHON_PING_INTERVAL)
+            try:
+                if self.state == "unauthorized":
+                    return
+                if not self.client.is_connected() or not await self.ping():
+                    self.state = "disconnected"
+                    await self.reconnect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER(__name__).error(f"Telethon keep-alive error: {e}")
+    
+    async def ensure_connected(self) -> bool:
+        """Ready client for a query: wait briefly for a reconnect in progress, else connect now"""
+        if self.state == "connected" and self.client.is_connected():
+            return True
+        if self._keepalive_task is not None and self.state == "reconnecting":
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=PyroConf.TELETHON_PING_TIMEOUT)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        if self.state in ("disabled", "unauthorized"):
             return False
+        if self.client is None:
+            return await self.create_client()
+        await self.reconnect()
+        return self.state == "connected"
+    
+    def status(self) -> str:
+        if self.latency_ms is None or self.state != "connected":
+            return f"{self.state} ({self.reconnects} reconnect(s))"
+        return f"{self.state}, {self.latency_ms:.0f} ms ping, {self.reconnects} reconnect(s)"
     
     async def get_topic_messages_range(self, chat_id, topic_id, start_msg_id, end_msg_id):
         """
         Get messages from a topic between start_msg_id and end_msg_id (both inclusive)
-        Returns list of message IDs that belong to the topic
+        Returns list of message IDs that belong to the topic, or None if the
+        topic could not be scanned (Telethon down, unauthorized or an error)
         """
-        if not self.client:
-            if not await self.create_client():
-                return []
+        if not await self.ensure_connected():
+            return None
         
         try:
-            # Get chat entity
-            chat = await self.client.get_entity(chat_id)
+            # Get chat entity (from Telethon's peer cache when possible)
+            chat = await self.get_input_peer(chat_id)
             
             LOGGER(__name__).info(f"Getting topic {topic_id} messages from {start_msg_id} to {end_msg_id}")
             
@@ -74,13 +192,34 @@ class TelethonHandler:
             LOGGER(__name__).info(f"Found {len(message_ids)} messages in topic {topic_id} range")
             return sorted(message_ids)  # Return sorted list
             
+        except (ChannelInvalidError, PeerIdInvalidError) as e:
+            # A rejected cached hash is dropped so the retry resolves the chat afresh
+            if not self.peers.forget(chat_id):
+                LOGGER(__name__).error(f"Error getting topic messages: {e}")
+                return None
+            return await self.get_topic_messages_range(chat_id, topic_id, start_msg_id, end_msg_id)
         except FloodWaitError as e:
             LOGGER(__name__).warning(f"Rate limit hit. Waiting {e.seconds} seconds...")
             await asyncio.sleep(e.seconds)
             return await self.get_topic_messages_range(chat_id, topic_id, start_msg_id, end_msg_id)
         except Exception as e:
             LOGGER(__name__).error(f"Error getting topic messages: {e}")
-            return []
+            return None
+    
+    async def get_input_peer(self, chat_id):
+        """InputPeer for chat_id, built from the peer cache or resolved once and cached"""
+        cached = self.peers.input_ids(chat_id)
+        if cached:
+            peer_type, raw_id, access_hash = cached
+            if peer_type == "channel":
+                return InputPeerChannel(raw_id, access_hash)
+            if peer_type == "user":
+                return InputPeerUser(raw_id, access_hash)
+            return InputPeerChat(raw_id)
+        self.peers.misses += 1
+        input_peer = get_input_peer(await self.client.get_entity(chat_id))
+        self.peers.remember(chat_id, input_peer)
+        return input_peer
     
     def _message_belongs_to_topic(self, message, topic_id: int) -> bool:
         """Check if a message belongs to a specific forum topic"""
@@ -102,6 +241,11 @@ class TelethonHandler:
     
     async def disconnect(self):
         """Disconnect Telethon client"""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        self.state = "stopped"
+        self._connected.clear()
         if self.client:
             await self.client.disconnect()
             self.client = None
@@ -0,0 +1,148 @@
+# bt/helpers/textpack.py
+# Pack text-only posts of a batch into few messages, or one .txt/.jsonl document
+
+import copy
+import json
+from typing import List, Tuple
+
+# Telegram's limit for one text message, in UTF-16 code units
+MESSAGE_LIMIT = 4096
+SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+# /bdl options: pack into messages, or one document of either kind
+TEXT_MODES = ("pack", "txt", "jsonl")
+
+
+def is_text_only(msg) -> bool:
+    return not msg.media and not msg.media_group_id and bool(msg.text)
+
+
+def utf16_len(text: str) -> int:
+    """Length as Telegram counts it (entity offsets and the message limit use UTF-16 units)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _shifted(entities, shift: int, start: int = 0, end: int = None) -> list:
+    """Copies of the entities overlapping [start, end), clipped to it and moved by shift - start"""
+    shifted = []
+    for entity in entities or []:
+        entity_start, entity_end = entity.offset, entity.offset + entity.length
+        if end is not None:
+            entity_start, entity_end = max(entity_start, start), min(entity_end, end)
+        if entity_end <= entity_start:
+            continue
+        moved = copy.copy(entity)
+        moved.offset = entity_start - start + shift
+        moved.length = entity_end - entity_start
+        shifted.append(moved)
+    return shifted
+
+
+class Block:
+    """One post as it appears in a pack: its source link, then its plain text with entities"""
+
+    def __init__(self, prefix: str, msg):
+        header = f"🔗 {prefix}/{msg.id}\n"
+        self.post_id = msg.id
+        self.header_len = utf16_len(header)
+        self.text = header + str(msg.text)
+        self.entities = _shifted(msg.entities, utf16_len(header))
+        self.size = utf16_len(self.text)
+
+    def _cut(self, start: int, limit: int, units: bytes) -> int:
+        """End of the longest piece from start that fits limit without cutting an entity or a surrogate pair"""
+        end = min(start + limit, self.size)
+        if end == self.size:
+            return end
+        inside = lambda i: any(e.offset < i < e.offset + e.length for e in self.entities)
+        low_surrogate = lambda i: 0xDC00 <= int.from_bytes(units[2 * i:2 * i + 2], "little") <= 0xDFFF
+        # Prefer a line break, then any position outside an entity, then anything that is not mid-character;
+        # never right after the link header, which would send the link on its own
+        first = max(start, self.header_len)
+        for candidates in (
+            (i for i in range(end, first, -1) if units[2 * i - 2:2 * i] == b"\n\x00" and not inside(i)),
+            (i for i in range(end, first, -1) if not inside(i) and not low_surrogate(i)),
+            (i for i in range(end, start, -1) if not low_surrogate(i)),
+        ):
+            cut = next(candidates, None)
+            if cut is not None:
+                return cut
+        return end
+
+    def pieces(self, limit: int) -> List[Tuple[str, list]]:
+        """The block as (text, entities) pieces of at most limit units each"""
+        if self.size <= limit:
+            return [(self.text, self.entities)]
+        units = self.text.encode("utf-16-le")
+        pieces = []
+        start = 0
+        while start < self.size:
+            end = self._cut(start, limit, units)
+            text = units[2 * start:2 * end].decode("utf-16-le")
+            pieces.append((text, _shifted(self.entities, 0, start, end)))
+            start = end
+        return pieces
+
+
+class Pack:
+    """Text and entities of one outgoing message, and the posts it (partly) carries"""
+
+    def __init__(self):
+        self.text = ""
+        self.entities = []
+        self.post_ids = []
+        self.size = 0
+
+    def add(self, text: str, entities: list, post_id: int):
+        shift = self.size
+        if self.text:
+            self.text += SEPARATOR
+            shift += utf16_len(SEPARATOR)
+        self.text += text
+        self.entities += _shifted(entities, shift)
+        self.size = utf16_len(self.text)
+        self.post_ids.append(post_id)
+
+
+def pack_blocks(blocks: List[Block], limit: int = MESSAGE_LIMIT) -> List[Pack]:
+    """
+    Greedily join blocks with SEPARATOR into as few packs of at most limit
+    UTF-16 units as possible, keeping their order. A block longer than limit
+    on its own is cut into pieces at line breaks or other points outside its
+    entities, so no pack ever splits a formatted span or link.
+    """
+    packs = []
+    current = Pack()
+    for block in blocks:
+        pieces = block.pieces(limit)
+        if len(pieces) > 1:
+            if current.text:
+                packs.append(current)
+                current = Pack()
+            for text, entities in pieces:
+                piece = Pack()
+                piece.add(text, entities, block.post_id)
+                packs.append(piece)
+            continue
+        if current.text and current.size + utf16_len(SEPARATOR) + block.size > limit:
+            packs.append(current)
+            current = Pack()
+        current.add(block.text, block.entities, block.post_id)
+    if current.text:
+        packs.append(current)
+    return packs
+
+
+def write_document(path: str, mode: str, prefix: str, messages: list):
+    """All text posts in one file: blocks separated like the packs (txt) or one JSON object per line (jsonl)"""
+    with open(path, "w", encoding="utf-8") as f:
+        if mode == "jsonl":
+            for msg in messages:
+                f.write(json.dumps({
+                    "id": msg.id,
+                    "date": msg.date.isoformat() if msg.date else None,
+                    "link": f"{prefix}/{msg.id}",
+                    "text": str(msg.text),
+                }, ensure_ascii=False) + "\n")
+        else:
+            f.write(SEPARATOR.join(Block(prefix, msg).text for msg in messages) + "\n")
@@ -4,6 +4,7 @@
 import os
 import uuid
 import asyncio
+from io import BytesIO
 from time import time
 from PIL import Image
 from logger import LOGGER
@@ -28,6 +29,14 @@ from helpers.files import (
 from helpers.msg import (
     get_parsed_msg
 )
+from helpers.concurrency import download_limiter, upload_limiter
+from helpers.disk import disk_budget, estimate_footprint
+from helpers.delivery import record_sent
+from helpers.relay import upload_relay, reply_file, BOT_UPLOAD_LIMIT
+from helpers.mediaprobe import probe_header
+from helpers.janitor import janitor
+from helpers.album import preupload, send_preuploaded_group
+from config import PyroConf
 
 # Progress bar template
 PROGRESS_BAR = """
@@ -53,6 +62,10 @@ async def cmd_exec(cmd, shell=False):
     return stdout, stderr, proc.returncode
 
 async def get_media_info(path):
+    # MP4/MKV durations come straight from the container headers; anything else goes to ffprobe
+    header = probe_header(path)
+    if header:
+        return header[0], None, None
     try:
         result = await cmd_exec([
             "ffprobe", "-hide_banner", "-loglevel", "error",
@@ -73,14 +86,15 @@ async def get_media_info(path):
         return duration, artist, title
     return 0, None, None
 
-async def split_large_video(video_path: str, progress_message) -> List[str]:
+async def split_large_video(video_path: str, progress_message, max_size: int = 0) -> List[str]:
     """
-    Split video larger than 2GB into parts using FFmpeg
+    Split video larger than max_size (default: the current upload limit) into parts using FFmpeg
     Returns list of part file paths
     """
     try:
         file_size = os.path.getsize(video_path)
-        if file_size <= 2 * 1024 * 1024 * 1024:  # 2GB
+        max_size = max_size or upload_relay.upload_limit()
+        if file_size <= max_size:
             return []
         
         # Get video duration
@@ -89,8 +103,8 @@ async def split_large_video(video_path: str, progress_message) -> List[str]:
             LOGGER(__name__).error("Could not get video duration for splitting")
             return []
         
-        # Calculate number of parts needed (aim for ~1.8GB per part to be safe)
-        target_size = 1.8 * 1024 * 1024 * 1024  # 1.8GB
+        # Calculate number of parts needed (aim for ~90% of the limit per part to be safe)
+        target_size = 0.9 * max_size
         num_parts = max(2, int((file_size / target_size) + 0.5))
         part_duration = duration // num_parts
         
@@ -120,6 +134,7 @@ async def split_large_video(video_path: str, progress_message) -> List[str]:
                 *duration_arg,
                 "-c", "copy",  # Copy streams without re-encoding (faster)
                 "-avoid_negative_ts", "make_zero",
+                "-movflags", "+faststart",  # moov up front, in the same pass
                 "-y", part_path
             ]
             
@@ -162,10 +177,9 @@ async def split_large_video(video_path: str, progress_message) -> List[str]:
 async def get_video_thumbnail(video_file, duration):
     # Create truly unique thumbnail filename using UUID
     unique_id = str(uuid.uuid4())
-    output = os.path.join("Assets", f"thumb_{unique_id}.jpg")
-    
-    # Ensure Assets directory exists
-    os.makedirs("Assets", exist_ok=True)
+    # Next to the video, so it lives (and is cleaned up) on the same storage root
+    output = janitor.claim(os.path.join(os.path.dirname(video_file) or "Assets", f"thumb_{unique_id}.jpg"))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
     
     if duration is None:
         duration = (await get_media_info(video_file))[0]
@@ -208,9 +222,9 @@ async def get_video_thumbnail(video_file, duration):
 def progressArgs(action: str, progress_message, start_time):
     return (action, progress_message, start_time, PROGRESS_BAR, "▓", "░")
 
-async def processMediaGroup(chat_message, bot, message):
-    media_group_messages = await chat_message.get_media_group()
-    valid_media = []
+async def processMediaGroup(chat_message, bot, message, media_group_messages=None):
+    if media_group_messages is None:
+        media_group_messages = await chat_message.get_media_group()
     temp_paths = []
     invalid_paths = []
     thumbnail_paths = []  # Track thumbnail paths for cleanup
@@ -222,10 +236,15 @@ async def processMediaGroup(chat_message, bot, message):
         f"Downloading media group with {len(media_group_messages)} items..."
     )
     
-    # Process each media item sequentially to avoid conflicts
-    for i, msg in enumerate(media_group_messages):
+    # Items download concurrently (bounded) and each one is uploaded as soon as it is ready;
+    # results are kept per index so the album keeps its order
+    prepared = [[] for _ in media_group_messages]
+    item_slots = asyncio.Semaphore(PyroConf.GROUP_CONCURRENCY)
+    
+    async def prepare(i, msg):
+        item_media = []
         if msg.photo or msg.video or msg.document or msg.audio:
-            media_path = None
+            media_path = download_path = None
             try:
                 LOGGER(__name__).info(f"Processing media {i+1}/{len(media_group_messages)}")
                 
@@ -251,22 +270,30 @@ async def processMediaGroup(chat_message, bot, message):
                             ext = f".{ext}" if ext else ""
                 
                 unique_filename = f"{name}_item{i+1}{ext}"
-                download_path = get_download_path(message.id, unique_filename)
+                media_obj = getattr(msg, msg.media.value, None)
+                file_size = getattr(media_obj, "file_size", 0) or 0
+                download_path = get_download_path(message.id, unique_filename, expected_size=file_size)
                 
-                media_path = await msg.download(
-                    file_name=download_path,
-                    progress=Leaves.progress_for_pyrogram,
-                    progress_args=progressArgs(
-                        f"📥 Downloading Progress ({i+1}/{len(media_group_messages)})",
-                        progress_message,
-                        start_time
-                    ),
+                await disk_budget.acquire(
+                    download_path,
+                    estimate_footprint(file_size),
+                    on_wait=lambda: progress_message.edit("**⏳ Waiting for free disk space...**"),
                 )
+                async with download_limiter.transfer(file_size):
+                    media_path = await msg.download(
+                        file_name=download_path,
+                        progress=Leaves.progress_for_pyrogram,
+                        progress_args=progressArgs(
+                            f"📥 Downloading Progress ({i+1}/{len(media_group_messages)})",
+                            progress_message,
+                            start_time
+                        ),
+                    )
                 temp_paths.append(media_path)
                 LOGGER(__name__).info(f"Downloaded: {media_path}")
                 
                 if msg.photo:
-                    valid_media.append(
+                    item_media.append(
                         InputMediaPhoto(
                             media=media_path,
                             caption=await get_parsed_msg(
@@ -277,11 +304,12 @@ async def processMediaGroup(chat_message, bot, message):
                 elif msg.video:
                     # Check if video needs splitting
                     file_size = os.path.getsize(media_path)
-                    if file_size > 2 * 1024 * 1024 * 1024:  # 2GB
+                    # Albums are always sent by the bot itself, so the 2GB bot limit applies
+                    if file_size > BOT_UPLOAD_LIMIT:
                         LOGGER(__name__).info(f"Video {i+1} is larger than 2GB, splitting...")
                         await progress_message.edit(f"**✂️ Splitting large video {i+1}...**")
                         
-                        split_paths = await split_large_video(media_path, progress_message)
+                        split_paths = await split_large_video(media_path, progress_message, BOT_UPLOAD_LIMIT)
                         if split_paths:
                             # Add each part as separate media
                             for j, part_path in enumerate(split_paths, 1):
@@ -298,7 +326,7 @@ async def processMediaGroup(chat_message, bot, message):
                                 
                                 part_caption = f"{await get_parsed_msg(msg.caption or '', msg.caption_entities) or ''}\n**Part {j} of {len(split_paths)}**"
                                 
-                                valid_media.append(
+                                item_media.append(
                                     InputMediaVideo(
                                         media=part_path,
                                         thumb=thumb,
@@ -321,7 +349,7 @@ async def processMediaGroup(chat_message, bot, message):
                                 width, height = 480, 320
                                 thumb = None
                             
-                            valid_media.append(
+                            item_media.append(
                                 InputMediaVideo(
                                     media=media_path,
                                     thumb=thumb,
@@ -352,7 +380,7 @@ async def processMediaGroup(chat_message, bot, message):
                         
                         LOGGER(__name__).info(f"Video {i+1}: thumb={thumb}, duration={duration}, size={width}x{height}")
                         
-                        valid_media.append(
+                        item_media.append(
                             InputMediaVideo(
                                 media=media_path,
                                 thumb=thumb,
@@ -365,7 +393,7 @@ async def processMediaGroup(chat_message, bot, message):
                             )
                         )
                 elif msg.document:
-                    valid_media.append(
+                    item_media.append(
                         InputMediaDocument(
                             media=media_path,
                             caption=await get_parsed_msg(
@@ -375,7 +403,7 @@ async def processMediaGroup(chat_message, bot, message):
                     )
                 elif msg.audio:
                     duration, artist, title = await get_media_info(media_path)
-                    valid_media.append(
+                    item_media.append(
                         InputMediaAudio(
                             media=media_path,
                             duration=duration,
@@ -390,7 +418,26 @@ async def processMediaGroup(chat_message, bot, message):
                 LOGGER(__name__).error(f"Error processing media {i+1}: {e}")
                 if media_path and os.path.exists(media_path):
                     invalid_paths.append(media_path)
-                continue
+                elif download_path:
+                    disk_budget.release(download_path)
+                return
+        
+        # Upload right away, while the other items are still downloading
+        for media in item_media:
+            try:
+                uploaded = await preupload(bot, message.chat.id, media)
+            except Exception as e:
+                LOGGER(__name__).error(f"Pre-upload failed for media {i+1}: {e}")
+                uploaded = None
+            prepared[i].append((media, uploaded))
+    
+    async def prepare_bounded(i, msg):
+        async with item_slots:
+            await prepare(i, msg)
+    
+    await asyncio.gather(*(prepare_bounded(i, msg) for i, msg in enumerate(media_group_messages)))
+    items = [item for item_list in prepared for item in item_list]
+    valid_media = [media for media, _ in items]
     
     LOGGER(__name__).info(f"Valid media count: {len(valid_media)}")
     
@@ -401,8 +448,15 @@ async def processMediaGroup(chat_message, bot, message):
             # If media group is too large, send in chunks of 10 (Telegram limit)
             chunk_size = 10
             for i in range(0, len(valid_media), chunk_size):
-                chunk = valid_media[i:i + chunk_size]
-                await bot.send_media_group(chat_id=message.chat.id, media=chunk)
+                chunk_items = items[i:i + chunk_size]
+                if all(uploaded for _, uploaded in chunk_items):
+                    # Every file is on Telegram already; this only assembles the album
+                    record_sent(await send_preuploaded_group(bot, message.chat.id, chunk_items))
+                else:
+                    chunk = [media for media, _ in chunk_items]
+                    chunk_bytes = sum(os.path.getsize(m.media) for m in chunk)
+                    async with upload_limiter.transfer(chunk_bytes):
+                        record_sent(await bot.send_media_group(chat_id=message.chat.id, media=chunk))
                 if i + chunk_size < len(valid_media):
                     await asyncio.sleep(1)  # Small delay between chunks
             
@@ -419,37 +473,38 @@ async def processMediaGroup(chat_message, bot, message):
             for i, media in enumerate(valid_media):
                 try:
                     LOGGER(__name__).info(f"Sending individual media {i+1}/{len(valid_media)}")
-                    if isinstance(media, InputMediaPhoto):
-                        await bot.send_photo(
-                            chat_id=message.chat.id,
-                            photo=media.media,
-                            caption=media.caption,
-                        )
-                    elif isinstance(media, InputMediaVideo):
-                        await bot.send_video(
-                            chat_id=message.chat.id,
-                            video=media.media,
-                            thumb=media.thumb,
-                            width=media.width,
-                            height=media.height,
-                            duration=media.duration,
-                            caption=media.caption,
-                        )
-                    elif isinstance(media, InputMediaDocument):
-                        await bot.send_document(
-                            chat_id=message.chat.id,
-                            document=media.media,
-                            caption=media.caption,
-                        )
-                    elif isinstance(media, InputMediaAudio):
-                        await bot.send_audio(
-                            chat_id=message.chat.id,
-                            audio=media.media,
-                            duration=media.duration,
-                            performer=media.performer,
-                            title=media.title,
-                            caption=media.caption,
-                        )
+                    async with upload_limiter.transfer(os.path.getsize(media.media)):
+                        if isinstance(media, InputMediaPhoto):
+                            record_sent(await bot.send_photo(
+                                chat_id=message.chat.id,
+                                photo=media.media,
+                                caption=media.caption,
+                            ))
+                        elif isinstance(media, InputMediaVideo):
+                            record_sent(await bot.send_video(
+                                chat_id=message.chat.id,
+                                video=media.media,
+                                thumb=media.thumb,
+                                width=media.width,
+                                height=media.height,
+                                duration=media.duration,
+                                caption=media.caption,
+                            ))
+                        elif isinstance(media, InputMediaDocument):
+                            record_sent(await bot.send_document(
+                                chat_id=message.chat.id,
+                                document=media.media,
+                                caption=media.caption,
+                            ))
+                        elif isinstance(media, InputMediaAudio):
+                            record_sent(await bot.send_audio(
+                                chat_id=message.chat.id,
+                                audio=media.media,
+                                duration=media.duration,
+                                performer=media.performer,
+                                title=media.title,
+                                caption=media.caption,
+                            ))
                     await asyncio.sleep(0.5)  # Small delay between individual sends
                 except Exception as individual_e:
                     LOGGER(__name__).error(f"Failed to upload individual media {i+1}: {individual_e}")
@@ -472,20 +527,25 @@ async def processMediaGroup(chat_message, bot, message):
 async def send_media(
     bot, message, media_path, media_type, caption, progress_message, start_time
 ):
-    file_size = os.path.getsize(media_path)
-    if not await fileSizeLimit(file_size, message, "upload"):
+    # media_path is a path on disk, or a BytesIO for the in-memory fast path
+    if isinstance(media_path, BytesIO):
+        file_size = media_path.getbuffer().nbytes
+    else:
+        file_size = os.path.getsize(media_path)
+    if not await fileSizeLimit(file_size, message, "upload", upload_relay.enabled):
         return
     
     progress_args = progressArgs("📥 Uploading Progress", progress_message, start_time)
     LOGGER(__name__).info(f"Uploading media: {media_path} ({media_type})")
     
     if media_type == "photo":
-        await message.reply_photo(
-            media_path,
-            caption=caption or "",
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progress_args,
-        )
+        async with upload_limiter.transfer(file_size):
+            record_sent(await message.reply_photo(
+                media_path,
+                caption=caption or "",
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progress_args,
+            ))
     elif media_type == "video":
         # Remove old generic thumbnail if exists
         old_thumb_pattern = os.path.join("Assets", "video_thumb.jpg")
@@ -495,7 +555,10 @@ async def send_media(
         duration = (await get_media_info(media_path))[0]
         thumb = await get_video_thumbnail(media_path, duration)
         
-        if thumb is not None and thumb != "none":
+        header = probe_header(media_path)
+        if header and header[1] and header[2]:
+            width, height = header[1], header[2]
+        elif thumb is not None and thumb != "none":
             with Image.open(thumb) as img:
                 width, height = img.size
         else:
@@ -505,16 +568,19 @@ async def send_media(
         if thumb == "none":
             thumb = None
         
-        await message.reply_video(
-            media_path,
-            duration=duration,
-            width=width,
-            height=height,
-            thumb=thumb,
-            caption=caption or "",
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progress_args,
-        )
+        async with upload_limiter.transfer(file_size):
+            record_sent(await reply_file(
+                message,
+                "video",
+                media_path,
+                duration=duration,
+                width=width,
+                height=height,
+                thumb=thumb,
+                caption=caption or "",
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progress_args,
+            ))
         
         # Clean up the unique thumbnail after upload
         if thumb and os.path.exists(thumb):
@@ -522,19 +588,25 @@ async def send_media(
             
     elif media_type == "audio":
         duration, artist, title = await get_media_info(media_path)
-        await message.reply_audio(
-            media_path,
-            duration=duration,
-            performer=artist,
-            title=title,
-            caption=caption or "",
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progress_args,
-        )
+        async with upload_limiter.transfer(file_size):
+            record_sent(await reply_file(
+                message,
+                "audio",
+                media_path,
+                duration=duration,
+                performer=artist,
+                title=title,
+                caption=caption or "",
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progress_args,
+            ))
     elif media_type == "document":
-        await message.reply_document(
-            media_path,
-            caption=caption or "",
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progress_args,
-        )
\ No newline at end of file
+        async with upload_limiter.transfer(file_size):
+            record_sent(await reply_file(
+                message,
+                "document",
+                media_path,
+                caption=caption or "",
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progress_args,
+            ))
@@ -0,0 +1,197 @@
+# bt/helpers/watch.py
+# /watch: mirror new posts from watched chats as they arrive, albums delivered whole
+
+import os
+import json
+import asyncio
+from collections import OrderedDict
+from pyrogram import filters
+from pyrogram.handlers import MessageHandler
+from logger import LOGGER
+from config import PyroConf
+from helpers.msg import message_belongs_to_topic
+
+# Several user sessions may see the same post; remember this many recent ones to deliver once
+SEEN_LIMIT = 2048
+
+
+class WatchList:
+    """
+    Watched (chat, topic) pairs, keyed by the numeric chat id that incoming
+    updates carry. Stored in a JSON file and reloaded whenever the file
+    changes, so a /watch handled by another worker process takes effect in
+    the one that receives updates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = {}
+        self._mtime = None
+
+    @staticmethod
+    def key(chat_id: int, thread_id) -> str:
+        return f"{chat_id}:{thread_id or 0}"
+
+    def refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._entries, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError):
+            pass
+
+    def _write(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def entries(self) -> dict:
+        self.refresh()
+        return self._entries
+
+    def add(self, chat_id: int, thread_id, prefix: str, requester: int, anchor_id: int):
+        self.refresh()
+        self._entries[self.key(chat_id, thread_id)] = {
+            "chat_id": chat_id,
+            "thread_id": thread_id,
+            "prefix": prefix,
+            "requester": requester,
+            "anchor_id": anchor_id,  # bot message the deliveries reply to
+        }
+        self._write()
+
+    def remove(self, chat_id: int, thread_id) -> bool:
+        self.refresh()
+        if self._entries.pop(self.key(chat_id, thread_id), None) is None:
+            return False
+        self._write()
+        return True
+
+    def match(self, message):
+        """Watch entry covering this incoming message, if any"""
+        self.refresh()
+        for entry in self._entries.values():
+            if entry["chat_id"] != message.chat.id:
+                continue
+            if entry["thread_id"] and not message_belongs_to_topic(message, entry["thread_id"]):
+                continue
+            return entry
+        return None
+
+    def watched_chats(self) -> set:
+        self.refresh()
+        return {entry["chat_id"] for entry in self._entries.values()}
+
+
+class Watcher:
+    """
+    Receives new messages from the user sessions. Posts without media are
+    ignored; album items are held until no new item of the same
+    media_group_id has arrived for WATCH_ALBUM_DELAY seconds, then the album
+    is delivered as one unit. Each watch has its own queue, so posts are
+    delivered in the order they were published.
+    """
+
+    def __init__(self, watch_list: WatchList, album_delay: float):
+        self.watch_list = watch_list
+        self.album_delay = album_delay
+        self._deliver = None
+        self._albums = {}  # media_group_id -> [messages]
+        self._album_slots = {}  # media_group_id -> future holding the album's place in its queue
+        self._album_timers = {}
+        self._queues = {}  # watch key -> asyncio.Queue of (entry, message, album)
+        self._drainers = {}  # watch key -> task delivering that queue
+        self._seen = OrderedDict()
+        self.delivered = 0
+
+    def start(self, clients: list, deliver):
+        """deliver(entry, message, album) sends one post (album is None for single posts)"""
+        self._deliver = deliver
+        watched = filters.create(lambda _, __, m: m.chat is not None and m.chat.id in self.watch_list.watched_chats())
+        for client in clients:
+            client.add_handler(MessageHandler(self._on_message, watched & ~filters.service))
+        LOGGER(__name__).info(f"Watching {len(self.watch_list.entries())} chat(s) on {len(clients)} session(s)")
+
+    def _first_sighting(self, message) -> bool:
+        key = (message.chat.id, message.id)
+        if key in self._seen:
+            return False
+        self._seen[key] = True
+        if len(self._seen) > SEEN_LIMIT:
+            self._seen.popitem(last=False)
+        return True
+
+    async def _on_message(self, _, message):
+        if not message.media or not self._first_sighting(message):
+            return
+        entry = self.watch_list.match(message)
+        if entry is None:
+            return
+        if not message.media_group_id:
+            self._enqueue(entry, message, None)
+            return
+        group = self._albums.setdefault(message.media_group_id, [])
+        if not group:
+            # Keep the album's place in the queue while its other items arrive
+            slot = self._album_slots[message.media_group_id] = asyncio.get_running_loop().create_future()
+            self._enqueue(entry, message, slot)
+        group.append(message)
+        timer = self._album_timers.pop(message.media_group_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._album_timers[message.media_group_id] = asyncio.get_running_loop().call_later(
+            self.album_delay, self._flush_album, entry, message.media_group_id
+        )
+
+    def _flush_album(self, entry, media_group_id):
+        self._album_timers.pop(media_group_id, None)
+        album = sorted(self._albums.pop(media_group_id, []), key=lambda m: m.id)
+        self._album_slots.pop(media_group_id).set_result(album)
+
+    def _enqueue(self, entry, message, album):
+        key = WatchList.key(entry["chat_id"], entry["thread_id"])
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+        if key not in self._drainers or self._drainers[key].done():
+            self._drainers[key] = asyncio.create_task(self._drain(queue))
+        queue.put_nowait((entry, message, album))
+
+    async def _drain(self, queue: asyncio.Queue):
+        while True:
+            entry, message, album = await queue.get()
+            try:
+                if isinstance(album, asyncio.Future):
+                    album = await album
+                    message = album[0]
+                await self._deliver(entry, message, album)
+                self.delivered += 1
+            except asyncio.CancelledError:
+                # /killall cancels the delivery, not the watch: keep draining unless this task is stopped
+                if asyncio.current_task().cancelling():
+                    raise
+                LOGGER(__name__).info(f"Watch delivery of {entry['prefix']}/{message.id} was canceled")
+            except Exception as e:
+                LOGGER(__name__).error(f"Watch delivery of {entry['prefix']}/{message.id} failed: {e}")
+
+    def status(self) -> str:
+        waiting = sum(queue.qsize() for queue in self._queues.values())
+        return (
+            f"{len(self.watch_list.entries())} chat(s), {self.delivered} delivered, "
+            f"{waiting} queued, {len(self._albums)} album(s) collecting"
+        )
+
+
+watch_list = WatchList(PyroConf.WATCH_LIST_PATH)
+watcher = Watcher(watch_list, PyroConf.WATCH_ALBUM_DELAY)
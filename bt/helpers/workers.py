@@ -0,0 +1,233 @@
+# bt/helpers/workers.py
+# Coordinator/worker mode: the main process handles updates, K worker processes run the jobs
+
+import os
+import sys
+import json
+import asyncio
+import functools
+import itertools
+from logger import LOGGER
+from config import PyroConf
+from helpers.encode import wants_single_file, set_single_file
+from helpers.scheduler import requester_id
+
+# Set by the coordinator in each worker's environment
+WORKER_ID = os.getenv("BT_WORKER")
+IS_WORKER = WORKER_ID is not None
+
+# Job handlers by name; workers look them up to run what the coordinator sends
+_handlers = {}
+
+
+def worker_env(index: int) -> dict:
+    """
+    Environment for worker `index`. Each worker gets its own subfolder of every
+    storage root and of the cache, so its janitor and cache only ever see its
+    own files.
+    """
+    roots = []
+    for item in PyroConf.STORAGE_ROOTS.split(","):
+        fields = item.strip().split(":")
+        if fields[0]:
+            fields[0] = os.path.join(fields[0], f"worker-{index}")
+            roots.append(":".join(fields))
+    return {
+        **os.environ,
+        "BT_WORKER": str(index),
+        "BT_COORDINATOR_SOCKET": PyroConf.WORKER_SOCKET,
+        "STORAGE_ROOTS": ",".join(roots) or f"downloads/worker-{index}",
+        "CACHE_DIR": os.path.join(PyroConf.CACHE_DIR, f"worker-{index}"),
+    }
+
+
+async def _send(writer, payload: dict):
+    writer.write(json.dumps(payload).encode() + b"\n")
+    await writer.drain()
+
+
+class WorkerLink:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.writer = None
+        self.ready = asyncio.Event()
+        self.jobs = {}  # job id -> requester Message
+        self.done = 0
+        self.failed = 0
+
+
+class WorkerPool:
+    """
+    Coordinator side. Starts `size` copies of main.py as worker processes
+    (each with its own bot and user client connections), accepts their
+    connections on a Unix socket and hands each job to the worker with the
+    fewest running jobs. Jobs travel as newline-delimited JSON naming the
+    handler and the requester's command message; the worker re-reads that
+    message with its own bot client and runs the same handler, so replies,
+    progress edits and uploads look exactly as in single-process mode.
+    Workers report back when each job finishes; if a worker dies, its
+    running jobs are reported as interrupted and it is restarted.
+    """
+
+    def __init__(self, size: int, socket_path: str):
+        self.size = size
+        self.socket_path = socket_path
+        self.links = [WorkerLink(i) for i in range(size)]
+        self._ids = itertools.count(1)
+        self._server = None
+        self._script = None
+        self._stopping = False
+        self._any_ready = asyncio.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and not IS_WORKER
+
+    async def start(self, script: str):
+        self._script = script
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._accept, path=self.socket_path)
+        for link in self.links:
+            asyncio.create_task(self._supervise(link))
+        LOGGER(__name__).info(f"Coordinator started {self.size} worker(s) on {self.socket_path}")
+
+    async def _supervise(self, link: WorkerLink):
+        """Run the worker process, restarting it (after failing its jobs) whenever it exits"""
+        while not self._stopping:
+            link.process = await asyncio.create_subprocess_exec(
+                sys.executable, self._script, env=worker_env(link.index)
+            )
+            returncode = await link.process.wait()
+            link.ready.clear()
+            link.writer = None
+            if not any(l.ready.is_set() for l in self.links):
+                self._any_ready.clear()
+            for job_id, message in list(link.jobs.items()):
+                link.failed += 1
+                await message.reply(f"**❌ Worker {link.index} exited while running this job.**")
+            link.jobs.clear()
+            if self._stopping:
+                return
+            LOGGER(__name__).error(f"Worker {link.index} exited with {returncode}; restarting")
+            await asyncio.sleep(5)
+
+    async def _accept(self, reader, writer):
+        hello = json.loads(await reader.readline())
+        link = self.links[hello["worker"]]
+        link.writer = writer
+        link.ready.set()
+        self._any_ready.set()
+        LOGGER(__name__).info(f"Worker {link.index} connected")
+        while line := await reader.readline():
+            event = json.loads(line)
+            if event["op"] == "done":
+                message = link.jobs.pop(event["job"], None)
+                if event.get("cancelled"):
+                    continue
+                if event.get("error"):
+                    link.failed += 1
+                    if message is not None:
+                        await message.reply(f"**❌ {event['error']}**")
+                else:
+                    link.done += 1
+        link.ready.clear()
+        link.writer = None
+
+    async def submit(self, handler: str, message, state: dict = None):
+        """Hand message's command to the least busy connected worker"""
+        await self._any_ready.wait()
+        link = min((l for l in self.links if l.ready.is_set()), key=lambda l: (len(l.jobs), l.index))
+        job_id = next(self._ids)
+        link.jobs[job_id] = message
+        await _send(link.writer, {
+            "op": "job",
+            "job": job_id,
+            "handler": handler,
+            "chat_id": message.chat.id,
+            "message_id": message.id,
+            "command": message.command,
+            "state": state or {},
+        })
+
+    async def cancel_all(self) -> int:
+        cancelled = 0
+        for link in self.links:
+            if link.writer is not None:
+                cancelled += len(link.jobs)
+                await _send(link.writer, {"op": "cancel_all"})
+        return cancelled
+
+    async def stop(self):
+        self._stopping = True
+        for link in self.links:
+            if link.process and link.process.returncode is None:
+                link.process.terminate()
+        if self._server:
+            self._server.close()
+
+    def status(self) -> str:
+        return ", ".join(
+            f"w{l.index}: {len(l.jobs)} running, {l.done} done, {l.failed} failed"
+            + ("" if l.ready.is_set() else " (down)")
+            for l in self.links
+        )
+
+
+worker_pool = WorkerPool(PyroConf.WORKERS, PyroConf.WORKER_SOCKET)
+
+
+def sharded(handler):
+    """Run this command handler on a worker process when the coordinator has workers"""
+    _handlers[handler.__name__] = handler
+
+    @functools.wraps(handler)
+    async def wrapper(client, message):
+        if worker_pool.enabled:
+            return await worker_pool.submit(handler.__name__, message, job_state(message))
+        return await handler(client, message)
+    return wrapper
+
+
+def job_state(message) -> dict:
+    """Per-user settings that live in the coordinator and must travel with the job"""
+    return {"single_file": wants_single_file(requester_id(message))}
+
+
+def apply_job_state(message, state: dict):
+    set_single_file(requester_id(message), state.get("single_file", False))
+
+
+async def run_worker(bot):
+    """Worker side: take jobs from the coordinator until it goes away"""
+    reader, writer = await asyncio.open_unix_connection(os.environ["BT_COORDINATOR_SOCKET"])
+    await _send(writer, {"op": "hello", "worker": int(WORKER_ID)})
+    LOGGER(__name__).info(f"Worker {WORKER_ID} connected to the coordinator")
+    running = set()
+
+    async def run_job(job: dict):
+        error = None
+        cancelled = False
+        try:
+            message = await bot.get_messages(job["chat_id"], job["message_id"])
+            message.command = job["command"]
+            apply_job_state(message, job["state"])
+            await _handlers[job["handler"]](bot, message)
+        except asyncio.CancelledError:
+            cancelled = True
+        except Exception as e:
+            LOGGER(__name__).error(f"Job {job['job']} ({job['handler']}) failed: {e}")
+            error = str(e)
+        await _send(writer, {"op": "done", "job": job["job"], "error": error, "cancelled": cancelled})
+
+    while line := await reader.readline():
+        event = json.loads(line)
+        if event["op"] == "job":
+            task = asyncio.create_task(run_job(event))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        elif event["op"] == "cancel_all":
+            for task in list(running):
+                task.cancel()
+    LOGGER(__name__).info(f"Worker {WORKER_ID}: coordinator closed the connection")
@@ -2,9 +2,12 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 
+# Worker processes (helpers/workers.py) keep their own log file
+LOG_FILE = f"logs-worker-{os.environ['BT_WORKER']}.txt" if os.getenv("BT_WORKER") else "logs.txt"
+
 # removing old logs file if they exist.
 try:
-    os.remove("logs.txt")
+    os.remove(LOG_FILE)
 except:
     pass
 
@@ -13,7 +16,7 @@ logging.basicConfig(
     format="[%(asctime)s - %(levelname)s] - %(funcName)s() - Line %(lineno)d: %(name)s - %(message)s",
     datefmt="%d-%b-%y %I:%M:%S %p",
     handlers=[
-        RotatingFileHandler("logs.txt", mode="w+", maxBytes=5000000, backupCount=10),
+        RotatingFileHandler(LOG_FILE, mode="w+", maxBytes=5000000, backupCount=10),
         logging.StreamHandler(),
     ],
 )
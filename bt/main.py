@@ -8,7 +8,7 @@ import asyncio
 from time import time
 from pyleaves import Leaves
 from pyrogram.enums import ParseMode
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
 from pyrogram.errors import PeerIdInvalid, BadRequest
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from helpers.utils import (
@@ -27,15 +27,46 @@ from helpers.files import (
 from helpers.msg import (
     getChatMsgID,
     get_file_name,
-    get_parsed_msg
+    get_parsed_msg,
+    media_size
 )
 from helpers.telethon_client import telethon_handler  # New import
+from helpers.concurrency import download_limiter, upload_limiter, memory_budget
+from helpers.disk import disk_budget, estimate_footprint
+from helpers.scheduler import job_scheduler, pick_lane, queue_notice, requester_id
+from helpers.cache import download_cache
+from helpers.fanout import fan_out, parse_destinations, default_destinations
+from helpers.splitter import PARTS_ON_DISK, split_stream, read_chunks, part_count
+from helpers.relay import upload_relay, reply_file
+from helpers.faststart import ensure_faststart
+from helpers.janitor import janitor
+from helpers.storage import storage
+from helpers.batch import fetch_messages, plan_batch
+from helpers.peers import peer_cache
+from helpers.sessions import SessionPool
+from helpers.sync import sync_store, latest_message_id
+from helpers.watch import watch_list, watcher
+from helpers.export import ChatExport, export_items
+from helpers.textpack import TEXT_MODES, Block, is_text_only, pack_blocks, write_document
+from helpers.workers import IS_WORKER, WORKER_ID, worker_pool, sharded, run_worker
+from helpers.encode import encode_scheduler, encode_to_size, wants_single_file, set_single_file
+from helpers.delivery import (
+    record_sent,
+    run_and_collect,
+    deliver_copies,
+    normalize_url,
+    post_flights,
+    url_flights
+)
 from config import PyroConf
 from logger import LOGGER
 
 from helpers.downloaders import (
+    DownloadFailed,
     save_cookies,
     aria2c_download,
+    get_remote_file_info,
+    stream_download,
     ytdlp_download,
     split_file_p7zip
 )
@@ -49,10 +80,19 @@ bot = Client(
     bot_token=PyroConf.BOT_TOKEN,
     workers=1000,
     parse_mode=ParseMode.MARKDOWN,
+    no_updates=IS_WORKER,  # workers only run jobs handed over by the coordinator
+    in_memory=IS_WORKER,  # so workers don't share the coordinator's media_bot.session file
 )
 
 # Client for user session
 user = Client("user_session", workers=1000, session_string=PyroConf.SESSION_STRING)
+upload_relay.attach(user)
+
+# Extra user sessions (SESSION_STRINGS) share source reads with the main one
+session_pool = SessionPool([user] + [
+    Client(f"user_session_{i}", workers=1000, session_string=session_string)
+    for i, session_string in enumerate(PyroConf.SESSION_STRINGS, start=1)
+])
 
 RUNNING_TASKS = set()
 
@@ -64,6 +104,21 @@ def track_task(coro):
     task.add_done_callback(_remove)
     return task
 
+async def _deliver_shared(bot: Client, message: Message, sent):
+    """Give a requester who attached to someone else's in-flight job a copy of its result"""
+    if not sent:
+        await message.reply("**❌ Nothing could be delivered for this link.**")
+        return
+    await deliver_copies(bot, message.chat.id, sent)
+
+async def _fan_out(bot: Client, message: Message, sent, destinations):
+    """Send what was just delivered to the extra destination chats, reusing the uploaded file_ids"""
+    if not sent or not destinations:
+        return
+    delivered = await fan_out(bot, sent, destinations)
+    if delivered < len(destinations):
+        await message.reply(f"**⚠️ Delivered to {delivered}/{len(destinations)} extra chat(s). Check /logs.**")
+
 @bot.on_message(filters.command("start") & filters.private)
 async def start(_, message: Message):
     welcome_text = (
@@ -90,6 +145,37 @@ from helpers.downloaders import (
     split_file_p7zip
 )
 
+async def _encode_instead_of_split(message, path, file_size, is_video, progress_message, requester: int = None):
+    """Re-encoded single file for users in encode mode, or None to split as usual"""
+    limit = upload_relay.upload_limit()
+    if not is_video or file_size <= limit or not wants_single_file(requester or requester_id(message)):
+        return None
+    return await encode_to_size(path, limit, progress_message)
+
+@bot.on_message(filters.command("mode") & filters.private)
+async def mode_command(_, message: Message):
+    """Choose between split parts and one re-encoded file for oversized videos"""
+    user_id = requester_id(message)
+    args = message.text.split()[1:]
+    if args and args[0].lower() in ("split", "encode"):
+        set_single_file(user_id, args[0].lower() == "encode")
+    elif args:
+        await message.reply("**Usage:** `/mode split` or `/mode encode`")
+        return
+    
+    if wants_single_file(user_id):
+        await message.reply(
+            "🎞️ **Mode: encode**\n"
+            f"Videos over {get_readable_file_size(upload_relay.upload_limit())} are re-encoded to fit one upload "
+            "(slower, lower quality). Send `/mode split` to get parts instead."
+        )
+    else:
+        await message.reply(
+            "✂️ **Mode: split**\n"
+            f"Videos over {get_readable_file_size(upload_relay.upload_limit())} are sent as parts at full quality. "
+            "Send `/mode encode` to get one re-encoded file instead."
+        )
+
 @bot.on_message(filters.command("ck") & filters.private)
 async def save_cookies_command(_, message: Message):
     """Save cookies in Netscape format for yt-dlp"""
@@ -110,7 +196,142 @@ async def save_cookies_command(_, message: Message):
     else:
         await message.reply("❌ **Failed to save cookies. Please check the format.**")
 
+async def _aria2c_job(bot: Client, message: Message, url: str, i: int, total: int, progress_message):
+    """Download one /l link with aria2c and upload it, splitting files over 2GB"""
+    download_path = cached_path = ticket = None
+    try:
+        remote_size, etag = await get_remote_file_info(url)
+        ticket = await job_scheduler.acquire(
+            requester_id(message), lane=pick_lane(remote_size or None), on_position=queue_notice(message)
+        )
+        await progress_message.edit(f"**📥 Downloading file {i}/{total}...**\n{url[:50]}...")
+        
+        # Generate unique filename
+        import datetime
+        from urllib.parse import urlparse, unquote
+        from helpers.downloaders import is_video_file  # Import the new function
+        
+        parsed_url = urlparse(url)
+        filename = unquote(os.path.basename(parsed_url.path)) or f"download_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        download_path = get_download_path(message.id, filename, expected_size=remote_size)
+        
+        # Non-video files over 2GB are cut into parts while they download instead of 7zipped afterwards
+        if remote_size > upload_relay.upload_limit() and not is_video_file(filename):
+            await _upload_streamed(
+                message, stream_download(url), download_path, f"**{filename}**", progress_message, remote_size
+            )
+            return
+        
+        # Same URL with the same ETag/Content-Length is served from the cache
+        cache_key = f"url:{normalize_url(url)}|{etag}|{remote_size}" if (etag or remote_size) else None
+        result = cached_path = download_cache.lookup(cache_key)
+        
+        if not result:
+            # Download with aria2c (it reserves disk space first, then takes a download slot)
+            success, result = await aria2c_download(
+                url, download_path, file_size=remote_size, progress_message=progress_message
+            )
+            
+            if not success:
+                raise DownloadFailed(result)
+            result = cached_path = download_cache.adopt(cache_key, result)
+        
+        file_size = os.path.getsize(result)
+        LOGGER(__name__).info(f"Downloaded file size: {get_readable_file_size(file_size)}")
+        
+        # Use filename as caption
+        caption = f"**{filename}**"
+        
+        # Check if it's a video file (including MP4)
+        is_video = is_video_file(result)
+        
+        encoded = await _encode_instead_of_split(message, result, file_size, is_video, progress_message)
+        if encoded:
+            # One re-encoded file instead of parts (/mode encode)
+            cleanup_download(result)
+            await _upload_video_or_doc(bot, message, encoded, filename, progress_message)
+        # Check if file needs splitting (over 2GB, or 4GB with the premium relay)
+        elif file_size > upload_relay.upload_limit():
+            if is_video:
+                # Use video splitting for video files
+                await progress_message.edit(f"**✂️ Video >2GB, splitting...**")
+                
+                from helpers.utils import split_large_video, get_media_info, get_video_thumbnail
+                parts = await split_large_video(result, progress_message)
+                
+                if parts:
+                    # Upload each part as video
+                    for j, part_path in enumerate(parts, 1):
+                        await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
+                        
+                        duration, _, _ = await get_media_info(part_path)
+                        thumb = await get_video_thumbnail(part_path, duration)
+                        
+                        part_caption = f"**{filename}**\n**Part {j} of {len(parts)}**"
+                        
+                        async with upload_limiter.transfer(os.path.getsize(part_path)):
+                            record_sent(await reply_file(
+                                message,
+                                "video",
+                                part_path,
+                                duration=duration,
+                                thumb=thumb,
+                                caption=part_caption,
+                                progress=Leaves.progress_for_pyrogram,
+                                progress_args=progressArgs(
+                                    f"📤 Uploading Part {j}/{len(parts)}",
+                                    progress_message,
+                                    time()
+                                )
+                            ))
+                        
+                        cleanup_download(part_path)
+                        if thumb:
+                            cleanup_download(thumb)
+                    
+                    cleanup_download(result)
+                else:
+                    # If video splitting failed, try 7zip
+                    await progress_message.edit(f"**✂️ Splitting with 7zip...**")
+                    parts = await split_file_p7zip(result, max_size_mb=1900, progress_message=progress_message)
+                    
+                    if parts:
+                        for j, part_path in enumerate(parts, 1):
+                            await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
+                            async with upload_limiter.transfer(os.path.getsize(part_path)):
+                                record_sent(await message.reply_document(
+                                    part_path,
+                                    caption=f"**{filename}**\n**Archive Part {j}/{len(parts)}**\nExtract all parts to get the video.",
+                                    progress=Leaves.progress_for_pyrogram,
+                                    progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
+                                ))
+                            cleanup_download(part_path)
+                        cleanup_download(result)
+                    else:
+                        # Upload as is
+                        await _upload_video_or_doc(bot, message, result, filename, progress_message)
+            else:
+                # Size wasn't known up front: cut the downloaded file into plain parts
+                await _upload_streamed(
+                    message, read_chunks(result), download_path, caption, progress_message, file_size
+                )
+                cleanup_download(result)
+        else:
+            # Upload directly with proper type detection
+            await _upload_video_or_doc(bot, message, result, filename, progress_message)
+            
+    except Exception:
+        for reserved_path in (download_path, cached_path):
+            if reserved_path:
+                disk_budget.release(reserved_path)
+        raise
+    finally:
+        download_cache.unpin(cached_path)
+        if ticket:
+            job_scheduler.release(ticket)
+
 @bot.on_message(filters.command("l") & filters.private)
+@sharded
 async def aria2c_download_command(bot: Client, message: Message):
     """Download files with aria2c"""
     if len(message.text.split(None, 1)) < 2:
@@ -121,7 +342,7 @@ async def aria2c_download_command(bot: Client, message: Message):
             "Features:\n"
             "• 16 connections per server\n"
             "• Auto-split large files\n"
-            "• Files >2GB will be split with 7zip"
+            "• Files >2GB are split into parts while downloading (rejoin with `cat`)"
         )
         return
     
@@ -132,53 +353,100 @@ async def aria2c_download_command(bot: Client, message: Message):
     
     for i, url in enumerate(urls, 1):
         try:
-            await progress_message.edit(f"**📥 Downloading file {i}/{len(urls)}...**\n{url[:50]}...")
-            
-            # Generate unique filename
-            import datetime
-            from urllib.parse import urlparse, unquote
-            from helpers.downloaders import is_video_file  # Import the new function
-            
-            parsed_url = urlparse(url)
-            filename = unquote(os.path.basename(parsed_url.path)) or f"download_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            download_path = get_download_path(message.id, filename)
-            
-            # Download with aria2c
-            success, result = await aria2c_download(url, download_path)
-            
-            if not success:
-                await message.reply(f"❌ **Failed to download file {i}:**\n{result}")
-                continue
-            
-            file_size = os.path.getsize(result)
-            LOGGER(__name__).info(f"Downloaded file size: {get_readable_file_size(file_size)}")
-            
-            # Use filename as caption
-            caption = f"**{filename}**"
-            
-            # Check if it's a video file (including MP4)
-            is_video = is_video_file(result)
-            
-            # Check if file needs splitting (>2GB)
-            if file_size > 2 * 1024 * 1024 * 1024:
-                if is_video:
-                    # Use video splitting for video files
-                    await progress_message.edit(f"**✂️ Video >2GB, splitting...**")
-                    
-                    from helpers.utils import split_large_video, get_media_info, get_video_thumbnail
-                    parts = await split_large_video(result, progress_message)
-                    
-                    if parts:
-                        # Upload each part as video
-                        for j, part_path in enumerate(parts, 1):
-                            await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                            
-                            duration, _, _ = await get_media_info(part_path)
-                            thumb = await get_video_thumbnail(part_path, duration)
-                            
-                            part_caption = f"**{filename}**\n**Part {j} of {len(parts)}**"
-                            
-                            await message.reply_video(
+            sent, shared = await url_flights.run(
+                ("l", normalize_url(url)),
+                # A task of its own, so /killall reaches it and the janitor sees its folders released
+                lambda: track_task(run_and_collect(_aria2c_job, bot, message, url, i, len(urls), progress_message)),
+            )
+            # Only the request that ran the job fans out; attached ones just get their copy
+            if shared:
+                await _deliver_shared(bot, message, sent)
+            else:
+                await _fan_out(bot, message, sent, default_destinations)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            await progress_message.delete()
+            return await message.reply(f"**❌ Canceled** at file {i} of {len(urls)}.")
+        except DownloadFailed as e:
+            await message.reply(f"❌ **Failed to download file {i}:**\n{e}")
+        except Exception as e:
+            LOGGER(__name__).error(f"Error downloading {url}: {e}")
+            await message.reply(f"❌ **Error with file {i}:** {str(e)}")
+    
+    await progress_message.delete()
+    await message.reply(f"✅ **Completed processing {len(urls)} link(s)**")
+
+async def _ytdlp_job(bot: Client, message: Message, url: str, i: int, total: int, progress_message):
+    """Download one /yl link with yt-dlp and upload it, splitting videos over 2GB"""
+    download_path = result = ticket = None
+    try:
+        ticket = await job_scheduler.acquire(requester_id(message), lane="heavy", on_position=queue_notice(message))
+        await progress_message.edit(f"**📥 Downloading video {i}/{total}...**\n{url[:50]}...")
+        
+        # Generate unique filename (will be updated after download)
+        import datetime
+        temp_filename = f"video_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        download_path = get_download_path(message.id, temp_filename)
+        
+        # Download with yt-dlp (now returns 3 values: success, path, title)
+        # yt-dlp takes a download slot itself, only while the video actually downloads
+        success, result, video_title = await ytdlp_download(url, download_path, use_aria2c=True, progress_message=progress_message)
+        
+        if not success:
+            raise DownloadFailed(result)
+        
+        # Get actual filename from downloaded file
+        actual_filename = os.path.basename(result)
+        file_size = os.path.getsize(result)
+        LOGGER(__name__).info(f"Downloaded video: {actual_filename}, size: {get_readable_file_size(file_size)}")
+        
+        # Use video title as caption, fallback to filename if no title
+        if video_title:
+            caption = f"**{video_title}**"
+            LOGGER(__name__).info(f"Using video title as caption: {video_title}")
+        else:
+            caption = f"**{actual_filename}**"
+            LOGGER(__name__).info(f"No title found, using filename as caption: {actual_filename}")
+        
+        # Check if it's a video file
+        from helpers.downloaders import is_video_file
+        is_video = is_video_file(result)
+        
+        encoded = await _encode_instead_of_split(message, result, file_size, is_video, progress_message)
+        if encoded:
+            # One re-encoded file instead of parts (/mode encode)
+            cleanup_download(result)
+            await _upload_video_or_doc_with_caption(bot, message, encoded, caption, progress_message)
+        # Check if file needs splitting (over 2GB, or 4GB with the premium relay)
+        elif file_size > upload_relay.upload_limit():
+            if is_video:
+                # Use video splitting method
+                await progress_message.edit(f"**✂️ Video >2GB, splitting...**")
+                
+                from helpers.utils import split_large_video
+                parts = await split_large_video(result, progress_message)
+                
+                if parts:
+                    # Upload each part as video
+                    for j, part_path in enumerate(parts, 1):
+                        await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
+                        
+                        # Get video info
+                        from helpers.utils import get_media_info, get_video_thumbnail
+                        duration, _, _ = await get_media_info(part_path)
+                        thumb = await get_video_thumbnail(part_path, duration)
+                        
+                        # Include title in part caption
+                        if video_title:
+                            part_caption = f"**{video_title}**\n**Part {j} of {len(parts)}**"
+                        else:
+                            part_caption = f"**{actual_filename}**\n**Part {j} of {len(parts)}**"
+                        
+                        async with upload_limiter.transfer(os.path.getsize(part_path)):
+                            record_sent(await reply_file(
+                                message,
+                                "video",
                                 part_path,
                                 duration=duration,
                                 thumb=thumb,
@@ -189,62 +457,72 @@ async def aria2c_download_command(bot: Client, message: Message):
                                     progress_message,
                                     time()
                                 )
-                            )
-                            
-                            cleanup_download(part_path)
-                            if thumb:
-                                cleanup_download(thumb)
-                        
-                        cleanup_download(result)
-                    else:
-                        # If video splitting failed, try 7zip
-                        await progress_message.edit(f"**✂️ Splitting with 7zip...**")
-                        parts = await split_file_p7zip(result, max_size_mb=1900, progress_message=progress_message)
+                            ))
                         
-                        if parts:
-                            for j, part_path in enumerate(parts, 1):
-                                await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                                await message.reply_document(
-                                    part_path,
-                                    caption=f"**{filename}**\n**Archive Part {j}/{len(parts)}**\nExtract all parts to get the video.",
-                                    progress=Leaves.progress_for_pyrogram,
-                                    progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
-                                )
-                                cleanup_download(part_path)
-                            cleanup_download(result)
-                        else:
-                            # Upload as is
-                            await _upload_video_or_doc(bot, message, result, filename, progress_message)
+                        cleanup_download(part_path)
+                        if thumb:
+                            cleanup_download(thumb)
+                    
+                    cleanup_download(result)
                 else:
-                    # Non-video file, use 7zip
-                    await progress_message.edit(f"**✂️ File >2GB, splitting with 7zip...**")
+                    # If video splitting failed, try 7zip
+                    await progress_message.edit(f"**✂️ Splitting with 7zip...**")
                     parts = await split_file_p7zip(result, max_size_mb=1900, progress_message=progress_message)
                     
                     if parts:
                         for j, part_path in enumerate(parts, 1):
                             await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                            await message.reply_document(
-                                part_path,
-                                caption=f"**{filename}**\n**Part {j} of {len(parts)}**",
-                                progress=Leaves.progress_for_pyrogram,
-                                progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
-                            )
+                            
+                            # Use title in archive caption
+                            if video_title:
+                                archive_caption = f"**{video_title}**\n**Video Archive Part {j}/{len(parts)}**\nExtract all parts to get the video."
+                            else:
+                                archive_caption = f"**{actual_filename}**\n**Video Archive Part {j}/{len(parts)}**\nExtract all parts to get the video."
+                            
+                            async with upload_limiter.transfer(os.path.getsize(part_path)):
+                                record_sent(await message.reply_document(
+                                    part_path,
+                                    caption=archive_caption,
+                                    progress=Leaves.progress_for_pyrogram,
+                                    progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
+                                ))
                             cleanup_download(part_path)
                         cleanup_download(result)
                     else:
-                        await _upload_video_or_doc(bot, message, result, filename, progress_message)
+                        # Upload as is with title
+                        await _upload_video_or_doc_with_caption(bot, message, result, caption, progress_message)
             else:
-                # Upload directly with proper type detection
-                await _upload_video_or_doc(bot, message, result, filename, progress_message)
-                
-        except Exception as e:
-            LOGGER(__name__).error(f"Error downloading {url}: {e}")
-            await message.reply(f"❌ **Error with file {i}:** {str(e)}")
-    
-    await progress_message.delete()
-    await message.reply(f"✅ **Completed processing {len(urls)} link(s)**")
+                # Non-video file: cut it into plain parts that upload as soon as each is written,
+                # next to the source (same filesystem) unless the source lives in the cache
+                parts_base = os.path.join(os.path.dirname(result), actual_filename)
+                if download_cache.owns(result):
+                    parts_base = get_download_path(message.id, actual_filename, expected_size=file_size)
+                await _upload_streamed(
+                    message,
+                    read_chunks(result),
+                    parts_base,
+                    caption,
+                    progress_message,
+                    file_size,
+                )
+                cleanup_download(result)
+        else:
+            # Upload directly with title as caption
+            await _upload_video_or_doc_with_caption(bot, message, result, caption, progress_message)
+            
+    except Exception:
+        for reserved_path in (download_path, result):
+            if reserved_path:
+                disk_budget.release(reserved_path)
+        raise
+    finally:
+        if download_cache.owns(result):
+            download_cache.unpin(result)
+        if ticket:
+            job_scheduler.release(ticket)
 
 @bot.on_message(filters.command("yl") & filters.private)
+@sharded
 async def ytdlp_download_command(bot: Client, message: Message):
     """Download videos with yt-dlp"""
     if len(message.text.split(None, 1)) < 2:
@@ -267,135 +545,23 @@ async def ytdlp_download_command(bot: Client, message: Message):
     
     for i, url in enumerate(urls, 1):
         try:
-            await progress_message.edit(f"**📥 Downloading video {i}/{len(urls)}...**\n{url[:50]}...")
-            
-            # Generate unique filename (will be updated after download)
-            import datetime
-            temp_filename = f"video_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-            download_path = get_download_path(message.id, temp_filename)
-            
-            # Download with yt-dlp (now returns 3 values: success, path, title)
-            success, result, video_title = await ytdlp_download(url, download_path, use_aria2c=True, progress_message=progress_message)
-            
-            if not success:
-                await message.reply(f"❌ **Failed to download video {i}:**\n{result}")
-                continue
-            
-            # Get actual filename from downloaded file
-            actual_filename = os.path.basename(result)
-            file_size = os.path.getsize(result)
-            LOGGER(__name__).info(f"Downloaded video: {actual_filename}, size: {get_readable_file_size(file_size)}")
-            
-            # Use video title as caption, fallback to filename if no title
-            if video_title:
-                caption = f"**{video_title}**"
-                LOGGER(__name__).info(f"Using video title as caption: {video_title}")
-            else:
-                caption = f"**{actual_filename}**"
-                LOGGER(__name__).info(f"No title found, using filename as caption: {actual_filename}")
-            
-            # Check if it's a video file
-            from helpers.downloaders import is_video_file
-            is_video = is_video_file(result)
-            
-            # Check if file needs splitting (>2GB)
-            if file_size > 2 * 1024 * 1024 * 1024:
-                if is_video:
-                    # Use video splitting method
-                    await progress_message.edit(f"**✂️ Video >2GB, splitting...**")
-                    
-                    from helpers.utils import split_large_video
-                    parts = await split_large_video(result, progress_message)
-                    
-                    if parts:
-                        # Upload each part as video
-                        for j, part_path in enumerate(parts, 1):
-                            await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                            
-                            # Get video info
-                            from helpers.utils import get_media_info, get_video_thumbnail
-                            duration, _, _ = await get_media_info(part_path)
-                            thumb = await get_video_thumbnail(part_path, duration)
-                            
-                            # Include title in part caption
-                            if video_title:
-                                part_caption = f"**{video_title}**\n**Part {j} of {len(parts)}**"
-                            else:
-                                part_caption = f"**{actual_filename}**\n**Part {j} of {len(parts)}**"
-                            
-                            await message.reply_video(
-                                part_path,
-                                duration=duration,
-                                thumb=thumb,
-                                caption=part_caption,
-                                progress=Leaves.progress_for_pyrogram,
-                                progress_args=progressArgs(
-                                    f"📤 Uploading Part {j}/{len(parts)}",
-                                    progress_message,
-                                    time()
-                                )
-                            )
-                            
-                            cleanup_download(part_path)
-                            if thumb:
-                                cleanup_download(thumb)
-                        
-                        cleanup_download(result)
-                    else:
-                        # If video splitting failed, try 7zip
-                        await progress_message.edit(f"**✂️ Splitting with 7zip...**")
-                        parts = await split_file_p7zip(result, max_size_mb=1900, progress_message=progress_message)
-                        
-                        if parts:
-                            for j, part_path in enumerate(parts, 1):
-                                await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                                
-                                # Use title in archive caption
-                                if video_title:
-                                    archive_caption = f"**{video_title}**\n**Video Archive Part {j}/{len(parts)}**\nExtract all parts to get the video."
-                                else:
-                                    archive_caption = f"**{actual_filename}**\n**Video Archive Part {j}/{len(parts)}**\nExtract all parts to get the video."
-                                
-                                await message.reply_document(
-                                    part_path,
-                                    caption=archive_caption,
-                                    progress=Leaves.progress_for_pyrogram,
-                                    progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
-                                )
-                                cleanup_download(part_path)
-                            cleanup_download(result)
-                        else:
-                            # Upload as is with title
-                            await _upload_video_or_doc_with_caption(bot, message, result, caption, progress_message)
-                else:
-                    # Non-video file, use 7zip
-                    await progress_message.edit(f"**✂️ File >2GB, splitting with 7zip...**")
-                    parts = await split_file_p7zip(result, max_size_mb=1900, progress_message=progress_message)
-                    
-                    if parts:
-                        for j, part_path in enumerate(parts, 1):
-                            await progress_message.edit(f"**📤 Uploading part {j}/{len(parts)}...**")
-                            
-                            # Use title for non-video parts too
-                            if video_title:
-                                part_caption = f"**{video_title}**\n**Part {j} of {len(parts)}**"
-                            else:
-                                part_caption = f"**{actual_filename}**\n**Part {j} of {len(parts)}**"
-                            
-                            await message.reply_document(
-                                part_path,
-                                caption=part_caption,
-                                progress=Leaves.progress_for_pyrogram,
-                                progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
-                            )
-                            cleanup_download(part_path)
-                        cleanup_download(result)
-                    else:
-                        await _upload_video_or_doc_with_caption(bot, message, result, caption, progress_message)
+            sent, shared = await url_flights.run(
+                ("yl", normalize_url(url)),
+                # A task of its own, so /killall reaches it and the janitor sees its folders released
+                lambda: track_task(run_and_collect(_ytdlp_job, bot, message, url, i, len(urls), progress_message)),
+            )
+            # Only the request that ran the job fans out; attached ones just get their copy
+            if shared:
+                await _deliver_shared(bot, message, sent)
             else:
-                # Upload directly with title as caption
-                await _upload_video_or_doc_with_caption(bot, message, result, caption, progress_message)
-                
+                await _fan_out(bot, message, sent, default_destinations)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            await progress_message.delete()
+            return await message.reply(f"**❌ Canceled** at video {i} of {len(urls)}.")
+        except DownloadFailed as e:
+            await message.reply(f"❌ **Failed to download video {i}:**\n{e}")
         except Exception as e:
             LOGGER(__name__).error(f"Error downloading {url}: {e}")
             await message.reply(f"❌ **Error with video {i}:** {str(e)}")
@@ -413,30 +579,37 @@ async def _upload_video_or_doc_with_caption(bot, message, file_path, caption, pr
     
     if is_video:
         # Upload as video (streamable)
+        await ensure_faststart(file_path)
         await progress_message.edit("**📤 Uploading video...**")
         duration, _, _ = await get_media_info(file_path)
         thumb = await get_video_thumbnail(file_path, duration)
         
-        await message.reply_video(
-            file_path,
-            duration=duration,
-            thumb=thumb,
-            caption=caption,
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progressArgs("📤 Uploading Video", progress_message, time())
-        )
+        async with upload_limiter.transfer(os.path.getsize(file_path)):
+            record_sent(await reply_file(
+                message,
+                "video",
+                file_path,
+                duration=duration,
+                thumb=thumb,
+                caption=caption,
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progressArgs("📤 Uploading Video", progress_message, time())
+            ))
         
         if thumb:
             cleanup_download(thumb)
     else:
         # Upload as document (for non-video files)
         await progress_message.edit("**📤 Uploading file...**")
-        await message.reply_document(
-            file_path,
-            caption=caption,
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progressArgs("📤 Uploading File", progress_message, time())
-        )
+        async with upload_limiter.transfer(os.path.getsize(file_path)):
+            record_sent(await reply_file(
+                message,
+                "document",
+                file_path,
+                caption=caption,
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progressArgs("📤 Uploading File", progress_message, time())
+            ))
     
     cleanup_download(file_path)
 
@@ -453,33 +626,76 @@ async def _upload_video_or_doc(bot, message, file_path, filename, progress_messa
     
     if is_video:
         # Upload as video (streamable)
+        await ensure_faststart(file_path)
         await progress_message.edit("**📤 Uploading video...**")
         duration, _, _ = await get_media_info(file_path)
         thumb = await get_video_thumbnail(file_path, duration)
         
-        await message.reply_video(
-            file_path,
-            duration=duration,
-            thumb=thumb,
-            caption=caption,
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progressArgs("📤 Uploading Video", progress_message, time())
-        )
+        async with upload_limiter.transfer(os.path.getsize(file_path)):
+            record_sent(await reply_file(
+                message,
+                "video",
+                file_path,
+                duration=duration,
+                thumb=thumb,
+                caption=caption,
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progressArgs("📤 Uploading Video", progress_message, time())
+            ))
         
         if thumb:
             cleanup_download(thumb)
     else:
         # Upload as document (for non-video files)
         await progress_message.edit("**📤 Uploading file...**")
-        await message.reply_document(
-            file_path,
-            caption=caption,
-            progress=Leaves.progress_for_pyrogram,
-            progress_args=progressArgs("📤 Uploading File", progress_message, time())
-        )
+        async with upload_limiter.transfer(os.path.getsize(file_path)):
+            record_sent(await reply_file(
+                message,
+                "document",
+                file_path,
+                caption=caption,
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progressArgs("📤 Uploading File", progress_message, time())
+            ))
     
     cleanup_download(file_path)
 
+async def _upload_streamed(message, chunks, download_path, caption, progress_message, file_size=0):
+    """Cut an oversized file into plain parts while it downloads and upload each part as soon as it is written"""
+    part_size = PyroConf.SPLIT_PART_MB * 1024 * 1024
+    total_parts = part_count(file_size, part_size) if file_size else None
+    name = os.path.basename(download_path)
+
+    async def upload_part(j, part_path):
+        label = f"Part {j} of {total_parts}" if total_parts else f"Part {j}"
+        await progress_message.edit(f"**📤 Uploading part {j}{f'/{total_parts}' if total_parts else ''}...**")
+        async with upload_limiter.transfer(os.path.getsize(part_path)):
+            record_sent(await message.reply_document(
+                part_path,
+                caption=f"{caption}\n**{label}**",
+                progress=Leaves.progress_for_pyrogram,
+                progress_args=progressArgs(f"📤 Part {j}", progress_message, time())
+            ))
+
+    # Only the part being uploaded, the queued ones and the one being written are on disk, never the whole file
+    await disk_budget.acquire(
+        download_path,
+        part_size * PARTS_ON_DISK,
+        on_wait=lambda: progress_message.edit("**⏳ Waiting for free disk space...**"),
+    )
+    try:
+        await progress_message.edit(f"**✂️ File >2GB, splitting into parts while downloading...**")
+        # Holds a download slot, but part uploads run inside it, so it is no throughput sample
+        async with download_limiter.transfer():
+            manifest_path = await split_stream(chunks, download_path, part_size, upload_part)
+        record_sent(await message.reply_document(
+            manifest_path,
+            caption=f"{caption}\n**🧩 Manifest (SHA-256)**\nRejoin with `cat {name}.0* > {name}`",
+        ))
+        cleanup_download(manifest_path)
+    finally:
+        disk_budget.release(download_path)
+
 
 @bot.on_message(filters.command("help") & filters.private)
 async def help_command(_, message: Message):
@@ -487,10 +703,24 @@ async def help_command(_, message: Message):
         "💡 **Media Downloader Bot Help**\n\n"
         "➤ **Download Media**\n"
         " – Send `/dl <post_URL>` **or** just paste a Telegram post link to fetch photos, videos, audio, or documents.\n\n"
+        "➤ **Deliver to More Chats**\n"
+        " – Send `/dl <post_URL> <chat> [chat ...]` to also send the post to other chats. "
+        "It is uploaded once and re-sent by file ID.\n\n"
+        "➤ **Oversized Videos**\n"
+        " – Send `/mode encode` to get one re-encoded file instead of parts, `/mode split` to go back.\n\n"
         "➤ **Batch Download**\n"
         " – Send `/bdl start_link end_link` to grab a series of posts in one go.\n"
         " 💡 Example: `/bdl https://t.me/mychannel/100 https://t.me/mychannel/120`\n"
-        "**It will download all posts from ID 100 to 120.**\n\n"
+        "**It will download all posts from ID 100 to 120.**\n"
+        " – Add `pack` to combine text-only posts into as few messages as possible, or `txt`/`jsonl` for one file.\n\n"
+        "➤ **Archive to Disk**\n"
+        " – Send `/export start_link end_link` to save posts on the server with a `manifest.jsonl`; nothing is uploaded.\n\n"
+        "➤ **Channel Sync**\n"
+        " – Send `/sync <post_URL>` to deliver everything from that post on; later runs only fetch newer posts.\n"
+        " – Add `every <hours>` to repeat it on a schedule, `/sync off <post_URL>` to stop, `/sync` to list.\n\n"
+        "➤ **Live Mirror**\n"
+        " – Send `/watch <post_URL>` to get new media posts from that chat (or topic) as they are published.\n"
+        " – `/watch off <post_URL>` stops it, `/watch` lists watched chats.\n\n"
         "➤ **Requirements**\n"
         " – Make sure the user client is part of the chat.\n\n"
         "➤ **If the bot hangs**\n"
@@ -508,7 +738,15 @@ async def help_command(_, message: Message):
     )
     await message.reply(help_text, reply_markup=markup, disable_web_page_preview=True)
 
-async def handle_download(bot: Client, message: Message, post_url: str):
+async def handle_download(bot: Client, message: Message, post_url: str, announce_queue: bool = True,
+                          destinations=None, chat_message: Message = None, album: list = None,
+                          requester: int = None) -> bool:
+    """
+    Deliver one post, replying with any error; returns False if it failed
+    (skipped posts are not failures). requester is the user the job is
+    queued and configured for when message is not theirs (/watch replies
+    to the bot's own anchor message).
+    """
     # Cut off URL at '?' if present
     if "?" in post_url:
         post_url = post_url.split("?", 1)[0]
@@ -516,8 +754,17 @@ async def handle_download(bot: Client, message: Message, post_url: str):
     try:
         chat_id, message_thread_id, message_id = getChatMsgID(post_url)
         
-        # Get the message normally (Pyrogram doesn't support message_thread_id parameter)
-        chat_message = await user.get_messages(chat_id=chat_id, message_ids=message_id)
+        # Get the message normally (Pyrogram doesn't support message_thread_id parameter),
+        # unless the caller already holds it (/bdl fetches the whole range up front)
+        if chat_message is None:
+            _, chat_message = await session_pool.read(
+                chat_id, lambda client: client.get_messages(chat_id=chat_id, message_ids=message_id)
+            )
+        
+        # Deleted or missing posts come back as an empty Message without a chat
+        if not chat_message or chat_message.empty or chat_message.chat is None:
+            await message.reply("**No media or text found in the post URL.**")
+            return True
         
         # If this is supposed to be a forum topic message, verify it belongs to the topic
         if message_thread_id:
@@ -526,7 +773,47 @@ async def handle_download(bot: Client, message: Message, post_url: str):
                     f"**❌ Message {message_id} does not belong to topic {message_thread_id} or has been deleted.**\n"
                     f"**Original URL:** {post_url}"
                 )
-                return
+                return True
+        
+        # Identical posts requested while one is in flight share a single download and upload
+        post_media = getattr(chat_message, chat_message.media.value, None) if chat_message.media else None
+        async with session_pool.busy(session_pool.client_for(chat_message), getattr(post_media, "file_size", 0) or 0):
+            sent, shared = await post_flights.run(
+                (chat_message.chat.id, chat_message.id),
+                lambda: run_and_collect(
+                    _deliver_post, bot, message, chat_message, post_url, announce_queue, album, requester
+                ),
+            )
+        # Only the request that ran the job fans out; attached ones just get their copy
+        if shared:
+            await _deliver_shared(bot, message, sent)
+        else:
+            await _fan_out(bot, message, sent, default_destinations if destinations is None else destinations)
+        return True
+    
+    except (PeerIdInvalid, BadRequest, KeyError):
+        await message.reply("**Make sure the user client is part of the chat.**")
+    except Exception as e:
+        error_message = f"**❌ {str(e)}**"
+        await message.reply(error_message)
+        LOGGER(__name__).error(e)
+    return False
+
+async def _deliver_post(bot: Client, message: Message, chat_message: Message, post_url: str, announce_queue: bool,
+                        album: list = None, requester: int = None):
+    """Download one post's media (or text) and send it to the requester"""
+    message_id = chat_message.id
+    download_path = cached_path = ticket = None
+    try:
+        # Wait for a fair-share slot in the lane matching the post's size (a whole album's,
+        # if it is one) before doing any transfer work
+        if chat_message.media_group_id and album is None:
+            album = await chat_message.get_media_group()
+        ticket = await job_scheduler.acquire(
+            requester or requester_id(message),
+            lane=pick_lane(media_size(album or [chat_message])),
+            on_position=queue_notice(message) if announce_queue else None,
+        )
         
         LOGGER(__name__).info(f"Downloading media from URL: {post_url}")
         
@@ -540,7 +827,7 @@ async def handle_download(bot: Client, message: Message, post_url: str):
             )
             
             if not await fileSizeLimit(
-                file_size, message, "download", user.me.is_premium
+                file_size, message, "download", session_pool.client_for(chat_message).me.is_premium
             ):
                 return
         
@@ -552,7 +839,7 @@ async def handle_download(bot: Client, message: Message, post_url: str):
         )
         
         if chat_message.media_group_id:
-            if not await processMediaGroup(chat_message, bot, message):
+            if not await processMediaGroup(chat_message, bot, message, album):
                 await message.reply(
                     "**Could not extract any valid media from the media group.**"
                 )
@@ -561,25 +848,8 @@ async def handle_download(bot: Client, message: Message, post_url: str):
             start_time = time()
             progress_message = await message.reply("**📥 Downloading Progress...**")
             
-            # Generate unique filename with timestamp to avoid conflicts
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            base_filename = get_file_name(message_id, chat_message)
-            name, ext = os.path.splitext(base_filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
-            
-            download_path = get_download_path(message.id, unique_filename)
-            
-            media_path = await chat_message.download(
-                file_name=download_path,
-                progress=Leaves.progress_for_pyrogram,
-                progress_args=progressArgs(
-                    "📥 Downloading Progress", progress_message, start_time
-                ),
-            )
-            
-            LOGGER(__name__).info(f"Downloaded media: {media_path}")
-            
+            media_obj = getattr(chat_message, chat_message.media.value, None)
+            file_size = getattr(media_obj, "file_size", 0) or 0
             media_type = (
                 "photo"
                 if chat_message.photo
@@ -590,8 +860,98 @@ async def handle_download(bot: Client, message: Message, post_url: str):
                 else "document"
             )
             
-            # Check if video is larger than 2GB and split if needed
-            if media_type == "video" and os.path.getsize(media_path) > 2 * 1024 * 1024 * 1024:
+            # Small photos/documents skip the disk entirely while the memory budget allows
+            if (
+                media_type in ("photo", "document")
+                and 0 < file_size <= PyroConf.IN_MEMORY_MAX_KB * 1024
+                and memory_budget.try_acquire(file_size)
+            ):
+                try:
+                    async with download_limiter.transfer(file_size):
+                        media_file = await chat_message.download(
+                            in_memory=True,
+                            progress=Leaves.progress_for_pyrogram,
+                            progress_args=progressArgs(
+                                "📥 Downloading Progress", progress_message, start_time
+                            ),
+                        )
+                    LOGGER(__name__).info(f"Downloaded media in memory: {media_file.name}")
+                    await send_media(
+                        bot,
+                        message,
+                        media_file,
+                        media_type,
+                        parsed_caption,
+                        progress_message,
+                        start_time,
+                    )
+                finally:
+                    memory_budget.release(file_size)
+                await progress_message.delete()
+                return
+            
+            # Non-video files over the upload limit can't be sent whole; cut them into parts as they stream in
+            if media_type != "video" and file_size > upload_relay.upload_limit():
+                base_filename = get_file_name(message_id, chat_message)
+                await _upload_streamed(
+                    message,
+                    session_pool.client_for(chat_message).stream_media(chat_message),
+                    get_download_path(message.id, base_filename, expected_size=PyroConf.SPLIT_PART_MB * 1024 * 1024 * PARTS_ON_DISK),
+                    parsed_caption or f"**{base_filename}**",
+                    progress_message,
+                    file_size,
+                )
+                await progress_message.delete()
+                return
+            
+            # A cached copy of this exact file (same file_unique_id) skips the download entirely
+            cache_key = f"tg:{media_obj.file_unique_id}" if getattr(media_obj, "file_unique_id", None) else None
+            media_path = cached_path = download_cache.lookup(cache_key)
+            
+            if not media_path:
+                # Generate unique filename with timestamp to avoid conflicts
+                import datetime
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                base_filename = get_file_name(message_id, chat_message)
+                name, ext = os.path.splitext(base_filename)
+                unique_filename = f"{name}_{timestamp}{ext}"
+                
+                download_path = get_download_path(message.id, unique_filename, expected_size=file_size)
+                
+                await disk_budget.acquire(
+                    download_path,
+                    estimate_footprint(file_size),
+                    on_wait=lambda: progress_message.edit("**⏳ Waiting for free disk space...**"),
+                )
+                async with download_limiter.transfer(file_size):
+                    media_path = await chat_message.download(
+                        file_name=download_path,
+                        progress=Leaves.progress_for_pyrogram,
+                        progress_args=progressArgs(
+                            "📥 Downloading Progress", progress_message, start_time
+                        ),
+                    )
+                
+                LOGGER(__name__).info(f"Downloaded media: {media_path}")
+                media_path = cached_path = download_cache.adopt(cache_key, media_path)
+            
+            encoded = await _encode_instead_of_split(
+                message, media_path, os.path.getsize(media_path), media_type == "video", progress_message, requester
+            )
+            if encoded:
+                # One re-encoded file instead of parts (/mode encode)
+                await send_media(
+                    bot,
+                    message,
+                    encoded,
+                    media_type,
+                    parsed_caption,
+                    progress_message,
+                    start_time,
+                )
+                cleanup_download(encoded)
+            # Check if video is larger than the upload limit and split if needed
+            elif media_type == "video" and os.path.getsize(media_path) > upload_relay.upload_limit():
                 LOGGER(__name__).info(f"Video file is larger than 2GB, splitting...")
                 await progress_message.edit("**✂️ Splitting large video...**")
                 
@@ -635,16 +995,16 @@ async def handle_download(bot: Client, message: Message, post_url: str):
             cleanup_download(media_path)
             await progress_message.delete()
         elif chat_message.text or chat_message.caption:
-            await message.reply(parsed_text or parsed_caption)
+            record_sent(await message.reply(parsed_text or parsed_caption))
         else:
             await message.reply("**No media or text found in the post URL.**")
-    
-    except (PeerIdInvalid, BadRequest, KeyError):
-        await message.reply("**Make sure the user client is part of the chat.**")
-    except Exception as e:
-        error_message = f"**❌ {str(e)}**"
-        await message.reply(error_message)
-        LOGGER(__name__).error(e)
+    finally:
+        for reserved_path in (download_path, cached_path):
+            if reserved_path:
+                disk_budget.release(reserved_path)
+        download_cache.unpin(cached_path)
+        if ticket:
+            job_scheduler.release(ticket)
 
 def message_belongs_to_topic(message, topic_id: int) -> bool:
     """Check if a message belongs to a specific forum topic"""
@@ -674,46 +1034,101 @@ def message_belongs_to_topic(message, topic_id: int) -> bool:
     return False
 
 @bot.on_message(filters.command("dl") & filters.private)
+@sharded
 async def download_media(bot: Client, message: Message):
     if len(message.command) < 2:
         await message.reply("**Provide a post URL after the /dl command.**")
         return
     
     post_url = message.command[1]
-    await track_task(handle_download(bot, message, post_url))
+    # Any further arguments are extra chats to deliver to: /dl <link> <chat> [chat ...]
+    destinations = default_destinations + parse_destinations(message.command[2:])
+    await track_task(handle_download(bot, message, post_url, destinations=destinations))
 
 @bot.on_message(filters.command("bdl") & filters.private)
+@sharded
 async def download_range(bot: Client, message: Message):
     args = message.text.split()
+    # Optional last argument: how to deliver text-only posts (see helpers/textpack.py)
+    text_mode = args.pop().lower() if len(args) == 4 and args[3].lower() in TEXT_MODES else None
+    batch = await _batch_range(message, args, "bdl", "🚀 **Batch Download Process**")
+    if batch is None:
+        return
+    start_chat, start_thread, message_ids, prefix, loading = batch
+    await run_batch(bot, message, loading, start_chat, start_thread, message_ids, prefix, text_mode=text_mode)
+
+@bot.on_message(filters.command("export") & filters.private)
+@sharded
+async def export_range(bot: Client, message: Message):
+    """Archive a range of posts to local disk: no thumbnails, splits or uploads"""
+    batch = await _batch_range(message, message.text.split(), "export", "🗄️ **Export to Disk**")
+    if batch is None:
+        return
+    start_chat, start_thread, message_ids, prefix, loading = batch
+    try:
+        held, deleted, not_in_topic = await _fetch_range(start_chat, start_thread, message_ids)
+    except Exception as e:
+        await loading.delete()
+        return await message.reply(f"**❌ Could not fetch messages: {e}**")
+    
+    export = ChatExport(PyroConf.EXPORT_DIR, start_chat, start_thread, prefix)
+    items = plan_batch(held, message_ids[0], message_ids[-1])
+    await loading.edit(f"🗄️ **Exporting {len(items)} post(s) to `{export.folder}`…**")
+    try:
+        failed = await track_task(export_items(export, items))
+    except asyncio.CancelledError:
+        await loading.delete()
+        return await message.reply(f"**❌ Export canceled** after {export.summary()}.")
+    await loading.delete()
+    
+    await message.reply(
+        "**✅ Export Complete!**\n"
+        "━━━━━━━━━━━━━━━━━━━\n"
+        f"🗄️ **Folder** : `{export.folder}`\n"
+        f"📥 **Saved** : {export.summary()}\n"
+        f"⏭️ **Skipped** : `{len(deleted) + len(not_in_topic)}` (deleted/not in topic)\n"
+        f"❌ **Failed** : `{failed}` post(s)"
+    )
+
+async def _batch_range(message: Message, args: list, command: str, title: str):
+    """
+    Parse `/<command> start_link end_link` (args is the split command) and list
+    the message ids in the range. Returns (chat, thread, message_ids, prefix,
+    loading message), or None after replying with the problem.
+    """
     if len(args) != 3 or not all(arg.startswith("https://t.me/") for arg in args[1:]):
         await message.reply(
-            "🚀 **Batch Download Process**\n"
-            "`/bdl start_link end_link`\n\n"
+            f"{title}\n"
+            f"`/{command} start_link end_link`\n\n"
             "💡 **Example:**\n"
-            "`/bdl https://t.me/mychannel/100 https://t.me/mychannel/120`\n"
-            "`/bdl https://t.me/channel/topic/100 https://t.me/channel/topic/120`"
+            f"`/{command} https://t.me/mychannel/100 https://t.me/mychannel/120`\n"
+            f"`/{command} https://t.me/channel/topic/100 https://t.me/channel/topic/120`"
+            + (
+                "\n\n📝 Add `pack` to send text-only posts packed into few messages, "
+                "or `txt` / `jsonl` to get them as one file."
+                if command == "bdl" else ""
+            )
         )
-        return
+        return None
     
     try:
         start_chat, start_thread, start_id = getChatMsgID(args[1])
         end_chat, end_thread, end_id = getChatMsgID(args[2])
     except Exception as e:
-        return await message.reply(f"**❌ Error parsing links:\n{e}**")
+        await message.reply(f"**❌ Error parsing links:\n{e}**")
+        return None
     
     if start_chat != end_chat:
-        return await message.reply("**❌ Both links must be from the same channel.**")
+        await message.reply("**❌ Both links must be from the same channel.**")
+        return None
     
     if start_thread != end_thread:
-        return await message.reply("**❌ Both links must be from the same topic thread.**")
+        await message.reply("**❌ Both links must be from the same topic thread.**")
+        return None
     
     if start_id > end_id:
-        return await message.reply("**❌ Invalid range: start ID cannot exceed end ID.**")
-    
-    try:
-        await user.get_chat(start_chat)
-    except Exception:
-        pass
+        await message.reply("**❌ Invalid range: start ID cannot exceed end ID.**")
+        return None
     
     # Build the correct URL prefix based on whether it's a forum topic or not
     if start_thread:
@@ -729,10 +1144,11 @@ async def download_range(bot: Client, message: Message):
         
         if not message_ids:
             await loading.delete()
-            return await message.reply(
+            await message.reply(
                 f"**❌ No messages found in topic {start_thread} between {start_id} and {end_id}.**\n"
                 "Make sure the Telethon session is valid and has access to the chat."
             )
+            return None
         
         await loading.edit(f"📥 **Downloading {len(message_ids)} {batch_type} {start_id}–{end_id}…**")
         
@@ -742,78 +1158,168 @@ async def download_range(bot: Client, message: Message):
         message_ids = list(range(start_id, end_id + 1))  # Sequential for non-forum
         loading = await message.reply(f"📥 **Downloading {batch_type} {start_id}–{end_id}…**")
     
+    return start_chat, start_thread, message_ids, prefix, loading
+
+async def _fetch_range(start_chat, start_thread, message_ids: list):
+    """Bulk-fetch message_ids; returns (usable messages, deleted ids, ids outside the topic)"""
+    _, fetched = await session_pool.read(
+        start_chat, lambda client: fetch_messages(client, start_chat, message_ids)
+    )
+    held, deleted, not_in_topic = [], [], []
+    for msg_id, chat_msg in zip(message_ids, fetched):
+        if not chat_msg or chat_msg.empty:
+            deleted.append(msg_id)
+        # For forum topics, we already filtered with Telethon, but double-check
+        elif start_thread and not message_belongs_to_topic(chat_msg, start_thread):
+            not_in_topic.append(msg_id)
+        else:
+            held.append(chat_msg)
+    return held, deleted, not_in_topic
+
+async def _send_text_posts(message: Message, text_mode: str, prefix: str, posts: list) -> set:
+    """
+    Deliver buffered text-only posts: packed into as few messages as fit
+    (pack) or as one file. Returns the ids of posts that could not be sent;
+    each pack succeeds or fails on its own.
+    """
+    if text_mode == "pack":
+        failed_ids = set()
+        for i, pack in enumerate(pack_blocks([Block(prefix, msg) for msg in posts])):
+            if i:
+                await asyncio.sleep(3)
+            try:
+                record_sent(await message.reply(
+                    pack.text, entities=pack.entities, disable_web_page_preview=True
+                ))
+            except Exception as e:
+                failed_ids.update(pack.post_ids)
+                LOGGER(__name__).error(f"Error sending packed text post(s) {pack.post_ids}: {e}")
+        return failed_ids
+    first, last = posts[0].id, posts[-1].id
+    path = get_download_path(message.id, f"text_posts_{first}-{last}.{text_mode}")
+    try:
+        write_document(path, text_mode, prefix, posts)
+        record_sent(await message.reply_document(
+            path, caption=f"📝 **{len(posts)} text post(s)** from {prefix} ({first}–{last})"
+        ))
+    except Exception as e:
+        LOGGER(__name__).error(f"Error sending {len(posts)} text post(s) as {text_mode}: {e}")
+        return {msg.id for msg in posts}
+    finally:
+        cleanup_download(path)
+    return set()
+
+async def run_batch(bot: Client, message: Message, loading: Message, start_chat, start_thread,
+                    message_ids: list, prefix: str, on_progress=None, text_mode: str = None):
+    """
+    Fetch message_ids in bulk and deliver them in order, then reply with a summary.
+    on_progress(last_id) is called whenever every post up to last_id has been
+    delivered or skipped; it stops being called after the first failure.
+    With text_mode, text-only posts are coalesced instead of sent one by one:
+    consecutive ones are packed into shared messages ("pack"), or all of them
+    go into one document ("txt"/"jsonl"). Ranges with more text than
+    TEXT_PACK_MAX_CHARS are sent as a .txt document even in "pack" mode.
+    """
     downloaded = skipped = failed = 0
-    deleted_messages = []
-    not_in_topic = []
     processed_media_groups = set()  # Track processed media group IDs
     media_group_skipped = []  # Track message IDs skipped due to media group
     
-    for msg_id in message_ids:
-        url = f"{prefix}/{msg_id}"
+    # Fetch the whole range in bulk, then plan one work item per post or album
+    try:
+        held, deleted_messages, not_in_topic = await _fetch_range(start_chat, start_thread, message_ids)
+    except Exception as e:
+        await loading.delete()
+        return await message.reply(f"**❌ Could not fetch messages: {e}**")
+    skipped += len(deleted_messages) + len(not_in_topic)
+    
+    items = plan_batch(held, message_ids[0], message_ids[-1])
+    text_posts = []  # text-only posts waiting to be sent together
+    if text_mode == "pack":
+        text_size = sum(len(item.message.text) for item in items if is_text_only(item.message))
+        if text_size > PyroConf.TEXT_PACK_MAX_CHARS:
+            text_mode = "txt"
+    
+    async def report(last_id):
+        # A document is only sent at the end, so nothing after its first post counts as delivered yet
+        if on_progress is not None and not failed and not (text_mode in ("txt", "jsonl") and text_posts):
+            await on_progress(last_id)
+    
+    async def flush_text() -> bool:
+        """Send the buffered text posts; False if /killall canceled it"""
+        nonlocal downloaded, failed
+        posts = text_posts[:]
+        text_posts.clear()
         try:
-            # Get message normally (no message_thread_id parameter)
-            chat_msg = await user.get_messages(chat_id=start_chat, message_ids=msg_id)
-            
-            if not chat_msg or chat_msg.empty:
-                deleted_messages.append(msg_id)
-                skipped += 1
-                continue
-            
-            # For forum topics, we already filtered with Telethon, but double-check
-            if start_thread and not message_belongs_to_topic(chat_msg, start_thread):
-                not_in_topic.append(msg_id)
-                skipped += 1
-                continue
-            
-            # Check if this message is part of a media group
-            if chat_msg.media_group_id:
-                if chat_msg.media_group_id in processed_media_groups:
-                    # This media group was already processed, skip this message
-                    media_group_skipped.append(msg_id)
-                    skipped += 1
-                    continue
-                else:
-                    # Mark this media group as processed
-                    processed_media_groups.add(chat_msg.media_group_id)
-                    LOGGER(__name__).info(f"Processing media group {chat_msg.media_group_id} at message {msg_id}")
-            
-            has_media = bool(chat_msg.media_group_id or chat_msg.media)
-            has_text = bool(chat_msg.text or chat_msg.caption)
-            
-            if not (has_media or has_text):
-                skipped += 1
-                continue
-            
-            task = track_task(handle_download(bot, message, url))
-            try:
-                await task
+            failed_ids = await track_task(_send_text_posts(message, text_mode, prefix, posts))
+        except asyncio.CancelledError:
+            return False
+        # Posts before the first unsent one still move the watermark
+        for msg in posts:
+            if msg.id in failed_ids:
+                failed += 1
+                deleted_messages.append(msg.id)
+            else:
                 downloaded += 1
-                
-                # If this was a media group, log how many files were in it
-                if chat_msg.media_group_id:
-                    try:
-                        media_group_messages = await chat_msg.get_media_group()
-                        LOGGER(__name__).info(f"Media group {chat_msg.media_group_id} contained {len(media_group_messages)} files")
-                    except:
-                        pass
-                        
-            except asyncio.CancelledError:
+                await report(msg.id)
+        return True
+    
+    for item in items:
+        chat_msg = item.message
+        url = f"{prefix}/{chat_msg.id}"
+        
+        if text_mode and is_text_only(chat_msg):
+            text_posts.append(chat_msg)
+            continue
+        if text_mode == "pack" and text_posts:
+            # A post with media ends the run of consecutive text posts
+            if not await flush_text():
                 await loading.delete()
                 return await message.reply(
                     f"**❌ Batch canceled** after downloading `{downloaded}` posts."
                 )
-            except Exception as download_e:
+            await asyncio.sleep(3)
+        
+        if item.media_group_id:
+            # The other items of the album travel with this work item
+            processed_media_groups.add(item.media_group_id)
+            media_group_skipped.extend(item.ids[1:])
+            skipped += len(item.ids) - 1
+            LOGGER(__name__).info(
+                f"Processing media group {item.media_group_id} at message {chat_msg.id} "
+                f"({len(item.ids)} item(s) in range)"
+            )
+        elif not (chat_msg.media or chat_msg.text or chat_msg.caption):
+            skipped += 1
+            await report(item.ids[-1])
+            continue
+        
+        task = track_task(handle_download(
+            bot, message, url, announce_queue=False, chat_message=chat_msg, album=item.album
+        ))
+        try:
+            if await task:
+                downloaded += 1
+                await report(item.ids[-1])
+            else:
+                # handle_download already told the user why; later posts must not move the watermark
                 failed += 1
-                deleted_messages.append(msg_id)
-                LOGGER(__name__).error(f"Error downloading {url}: {download_e}")
-                
-        except Exception as e:
+                deleted_messages.append(chat_msg.id)
+        except asyncio.CancelledError:
+            await loading.delete()
+            return await message.reply(
+                f"**❌ Batch canceled** after downloading `{downloaded}` posts."
+            )
+        except Exception as download_e:
             failed += 1
-            deleted_messages.append(msg_id)
-            LOGGER(__name__).error(f"Error at {url}: {e}")
+            deleted_messages.append(chat_msg.id)
+            LOGGER(__name__).error(f"Error downloading {url}: {download_e}")
         
         await asyncio.sleep(3)
     
+    if text_posts and not await flush_text():
+        await loading.delete()
+        return await message.reply(f"**❌ Batch canceled** after downloading `{downloaded}` posts.")
+    await report(message_ids[-1])
     await loading.delete()
     
     # Enhanced completion message
@@ -850,6 +1356,149 @@ async def download_range(bot: Client, message: Message):
     
     await message.reply(result_message)
 
+async def run_sync(bot: Client, message: Message, entry: dict):
+    """Deliver every post newer than entry's watermark, advancing it as posts go out"""
+    chat_id, thread_id, prefix = entry["chat_id"], entry["thread_id"], entry["prefix"]
+    start_id = entry["last_id"] + 1
+    _, end_id = await session_pool.read(chat_id, lambda client: latest_message_id(client, chat_id))
+    if end_id < start_id:
+        return await message.reply(f"**✅ {prefix} is up to date** (last post `{entry['last_id']}`).")
+    
+    loading = await message.reply(f"🔄 **Syncing {prefix}: posts {start_id}–{end_id}…**")
+    if thread_id:
+        message_ids = await telethon_handler.get_topic_messages_range(chat_id, thread_id, start_id, end_id)
+        if message_ids is None:
+            # The topic could not be scanned; keep the watermark so the next run looks again
+            await loading.delete()
+            return await message.reply(
+                f"**❌ Could not list topic {thread_id} posts of {prefix}.**\n"
+                "Make sure the Telethon session is valid and has access to the chat."
+            )
+        if not message_ids:
+            # Nothing new in this topic; everything up to end_id has been looked at
+            sync_store.advance(chat_id, thread_id, end_id)
+            await loading.delete()
+            return await message.reply(f"**✅ {prefix} is up to date** (no new topic posts).")
+    else:
+        message_ids = list(range(start_id, end_id + 1))
+    
+    async def advance(last_id):
+        sync_store.advance(chat_id, thread_id, last_id)
+    
+    await run_batch(bot, message, loading, chat_id, thread_id, message_ids, prefix, on_progress=advance)
+
+async def run_scheduled_sync(entry: dict):
+    status = await bot.send_message(entry["requester"], f"🕒 **Scheduled sync of {entry['prefix']}**")
+    await track_task(run_sync(bot, status, entry))
+
+@bot.on_message(filters.command("sync") & filters.private)
+@sharded
+async def sync_command(bot: Client, message: Message):
+    """Incremental channel mirror: only posts after the stored watermark are fetched"""
+    args = message.command[1:]
+    if not args:
+        entries = sync_store.entries()
+        if not entries:
+            return await message.reply(
+                "🔄 **Channel Sync**\n"
+                "`/sync post_link [every hours]`\n"
+                "`/sync off post_link`\n\n"
+                "The first run starts at the linked post; later runs only deliver newer posts."
+            )
+        lines = [
+            f"• {e['prefix']} — last `{e['last_id']}`"
+            + (f", every {e['every'] / 3600:g}h" if e["every"] else "")
+            for e in entries.values()
+        ]
+        return await message.reply("**🔄 Synced chats**\n" + "\n".join(lines))
+    
+    remove = args[0].lower() == "off"
+    if remove:
+        args = args[1:]
+    try:
+        chat_id, thread_id, first_id = getChatMsgID(args[0].split("?", 1)[0])
+    except Exception as e:
+        return await message.reply(f"**❌ Error parsing link:\n{e}**")
+    
+    if remove:
+        if sync_store.remove(chat_id, thread_id):
+            return await message.reply("**🗑️ Sync removed.**")
+        return await message.reply("**❌ That chat is not being synced.**")
+    
+    every = 0
+    if len(args) >= 3 and args[1].lower() == "every":
+        try:
+            every = float(args[2].rstrip("hH")) * 3600
+        except ValueError:
+            return await message.reply("**❌ Usage:** `/sync post_link every <hours>`")
+    
+    entry = sync_store.ensure(chat_id, thread_id, args[0].rsplit("/", 1)[0], first_id, message.chat.id)
+    if every:
+        sync_store.update(chat_id, thread_id, every=every, requester=message.chat.id)
+    try:
+        await track_task(run_sync(bot, message, entry))
+    except asyncio.CancelledError:
+        return
+    except Exception as e:
+        LOGGER(__name__).error(f"Sync of {entry['prefix']} failed: {e}")
+        await message.reply(f"**❌ Sync failed: {e}**")
+    sync_store.update(chat_id, thread_id, last_run=time())
+
+_watch_anchors = {}
+
+async def deliver_watched(entry: dict, chat_message: Message, album: list):
+    """Send one new post from a watched chat as a reply to the watch's anchor message"""
+    anchor = _watch_anchors.get(entry["anchor_id"])
+    if anchor is None:
+        anchor = await bot.get_messages(entry["requester"], entry["anchor_id"])
+        if not anchor or anchor.empty:
+            anchor = await bot.send_message(entry["requester"], f"👀 **Watching {entry['prefix']}**")
+        _watch_anchors[entry["anchor_id"]] = anchor
+    url = f"{entry['prefix']}/{chat_message.id}"
+    await track_task(handle_download(
+        bot, anchor, url, announce_queue=False, chat_message=chat_message, album=album,
+        requester=entry["requester"],
+    ))
+
+@bot.on_message(filters.command("watch") & filters.private)
+@sharded
+async def watch_command(bot: Client, message: Message):
+    """Live mirror: new media posts in watched chats are delivered as they arrive"""
+    args = message.command[1:]
+    if not args:
+        entries = watch_list.entries()
+        if not entries:
+            return await message.reply(
+                "👀 **Live Mirror**\n"
+                "`/watch post_link`\n"
+                "`/watch off post_link`\n\n"
+                "New media posts in the link's chat (or topic) are sent here as soon as they are published."
+            )
+        lines = [
+            f"• {e['prefix']}" + (f" (topic {e['thread_id']})" if e["thread_id"] else "")
+            for e in entries.values()
+        ]
+        return await message.reply("**👀 Watched chats**\n" + "\n".join(lines))
+    
+    remove = args[0].lower() == "off"
+    if remove:
+        args = args[1:]
+    try:
+        chat_id, thread_id, _ = getChatMsgID(args[0].split("?", 1)[0])
+        # Incoming updates carry the numeric id, so resolve usernames now
+        _, chat = await session_pool.read(chat_id, lambda client: client.get_chat(chat_id))
+    except Exception as e:
+        return await message.reply(f"**❌ Error resolving chat:\n{e}**")
+    
+    if remove:
+        if watch_list.remove(chat.id, thread_id):
+            return await message.reply("**🗑️ Stopped watching.**")
+        return await message.reply("**❌ That chat is not being watched.**")
+    
+    prefix = args[0].split("?", 1)[0].rsplit("/", 1)[0]
+    anchor = await message.reply(f"👀 **Watching {prefix}**\nNew media posts will be sent as replies here.")
+    watch_list.add(chat.id, thread_id, prefix, message.chat.id, anchor.id)
+
 @bot.on_message(filters.command("stats") & filters.private)
 async def stats(_, message: Message):
     currentTime = get_readable_time(time() - PyroConf.BOT_START_TIME)
@@ -875,7 +1524,22 @@ async def stats(_, message: Message):
         f"**➜ Download:** `{recv}`\n\n"
         f"**➜ CPU:** `{cpuUsage}%` | "
         f"**➜ RAM:** `{memory}%` | "
-        f"**➜ DISK:** `{disk}%`"
+        f"**➜ DISK:** `{disk}%`\n\n"
+        f"**➜ Download Slots:** `{download_limiter.status()}`\n"
+        f"**➜ Upload Slots:** `{upload_limiter.status()}`\n"
+        f"**➜ Disk Reserved:** `{disk_budget.status()}`\n"
+        f"**➜ In-Memory Buffers:** `{memory_budget.status()}`\n"
+        f"**➜ Job Queue:** `{job_scheduler.status()}`\n"
+        f"**➜ Download Cache:** `{download_cache.status()}`\n"
+        f"**➜ Storage:** `{storage.status()}`\n"
+        f"**➜ Janitor:** `{janitor.status()}`\n"
+        f"**➜ Peer Cache:** `{peer_cache.status()}` (Telethon: `{telethon_handler.peers.status()}`)\n"
+        f"**➜ Telethon:** `{telethon_handler.status()}`\n"
+        f"**➜ User Sessions:** `{session_pool.status()}`\n"
+        f"**➜ Watch:** `{watcher.status()}`\n"
+        f"**➜ Workers:** `{worker_pool.status() if worker_pool.enabled else 'off'}`\n"
+        f"**➜ Re-encodes:** `{encode_scheduler.status()}`\n"
+        f"**➜ Upload Limit:** `{get_readable_file_size(upload_relay.upload_limit())}`{' (premium relay)' if upload_relay.enabled else ''}"
     )
     await message.reply(stats)
 
@@ -893,19 +1557,52 @@ async def cancel_all_tasks(_, message: Message):
         if not task.done():
             task.cancel()
             cancelled += 1
+    if worker_pool.enabled:
+        cancelled += await worker_pool.cancel_all()
+    # Cancelled jobs leave their folders behind; sweep them now rather than at the next interval
+    janitor.wake()
     await message.reply(f"**Cancelled {cancelled} running task(s).**")
 
+async def main():
+    if worker_pool.enabled:
+        # Coordinator: only the bot's update handling runs here; jobs, their client
+        # connections and the janitor for their folders live in the workers
+        await bot.start()
+        await worker_pool.start(os.path.abspath(__file__))
+        LOGGER(__name__).info("Bot Started!")
+        try:
+            await idle()
+        finally:
+            await worker_pool.stop()
+            await bot.stop()
+        return
+    
+    await session_pool.start()
+    janitor.start(asyncio.get_running_loop())
+    await telethon_handler.start()
+    await bot.start()
+    if WORKER_ID in (None, "0"):
+        # Scheduled syncs and live watches run in one process only
+        sync_store.start(asyncio.get_running_loop(), run_scheduled_sync)
+        watcher.start(session_pool.clients, deliver_watched)
+    LOGGER(__name__).info(f"Worker {WORKER_ID} started" if IS_WORKER else "Bot Started!")
+    try:
+        if IS_WORKER:
+            await run_worker(bot)
+        else:
+            await idle()
+    finally:
+        # Cleanup Telethon connection
+        await telethon_handler.disconnect()
+        await bot.stop()
+        await session_pool.stop()
+
 if __name__ == "__main__":
     try:
-        LOGGER(__name__).info("Bot Started!")
-        user.start()
-        bot.run()
+        bot.run(main())
     except KeyboardInterrupt:
         pass
     except Exception as err:
         LOGGER(__name__).error(err)
     finally:
-        # Cleanup Telethon connection
-        if telethon_handler.client:
-            asyncio.run(telethon_handler.disconnect())
-        LOGGER(__name__).info("Bot Stopped")
\ No newline at end of file
+        LOGGER(__name__).info("Bot Stopped")